@@ -8,6 +8,8 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
+
 from database import FoodDatabase, FoodItem
 from ocr_engine import FoodExpiryDetector
 from alerts import AlertSystem
@@ -20,11 +22,44 @@ logger.add("logs/app.log", rotation="500 MB", level="INFO")
 UTC = timezone.utc
 
 
+# Frequently repeated unit / location values, interned so equal values share
+# one string object across items (categories are interned by FoodDatabase)
+_COMMON_STRINGS = frozenset(sys.intern(s) for s in (
+    'units', 'kg', 'g', 'L', 'ml',
+    'Refrigerator', 'Freezer', 'Pantry',
+))
+
+
+def _maybe_intern(value: str) -> str:
+    """Return the interned copy of value if it is one of _COMMON_STRINGS"""
+    return sys.intern(value) if value in _COMMON_STRINGS else value
+
+
 def now_utc() -> datetime:
     """Helper: current time in UTC"""
     return datetime.now(UTC)
 
 
+def _fast_parse_iso(s: str) -> datetime:
+    """
+    Parse canonical 'YYYY-MM-DD' / 'YYYY-MM-DDTHH:MM:SS' strings by fixed offsets.
+    Anything else goes through datetime.fromisoformat. Naive results are taken as UTC.
+    """
+    n = len(s)
+    if (n == 10 or (n == 19 and s[10] in 'T ' and s[13] == ':' and s[16] == ':')) \
+            and s[4] == '-' and s[7] == '-':
+        try:
+            if n == 10:
+                return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]), tzinfo=UTC)
+            return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                            int(s[11:13]), int(s[14:16]), int(s[17:19]), tzinfo=UTC)
+        except ValueError:
+            pass
+
+    dt = datetime.fromisoformat(s)
+    return dt if dt.tzinfo else dt.replace(tzinfo=UTC)
+
+
 class FoodExpiryTrackerApp:
     """Main application class"""
 
@@ -46,7 +81,7 @@ class FoodExpiryTrackerApp:
         location: str = "Refrigerator"
     ) -> dict:
         """Add food item using OCR from image"""
-        logger.info(f"Processing food image: {image_path}")
+        logger.info("Processing food image: {}", image_path)
 
         if not Path(image_path).is_file():
             return {'success': False, 'message': f"Image not found: {image_path}"}
@@ -62,7 +97,7 @@ class FoodExpiryTrackerApp:
                 }
 
             expiry_str = ocr_result['date']
-            expiry_date = datetime.fromisoformat(expiry_str)
+            expiry_date = _fast_parse_iso(expiry_str)
 
             food = FoodItem(
                 name=(name or "Unknown Food").strip(),
@@ -70,21 +105,21 @@ class FoodExpiryTrackerApp:
                 purchase_date=now_utc(),
                 expiry_date=expiry_date,
                 quantity=quantity,
-                unit=unit.strip(),
-                location=location.strip(),
+                unit=_maybe_intern(unit.strip()),
+                location=_maybe_intern(location.strip()),
                 status='active',
                 ocr_confidence=ocr_result.get('confidence', 0.0),
                 image_path=image_path,
                 notes=f"Extracted from image - {ocr_result.get('raw_text', '')}"
             )
 
-            item_id = self.db.add_food_item(food)
-
             days_until = ocr_result.get('days_until_expiry', -1)
-            if days_until >= 0:
-                for threshold_name, threshold_days in self.alerts.ALERT_THRESHOLDS.items():
-                    if days_until <= threshold_days:
-                        self.alerts.log_alert(item_id, threshold_name, days_until)
+            level = self.alerts.alert_level_for(days_until) if days_until >= 0 else None
+
+            # Item and its alert are written in one transaction
+            item_id = self.db.add_food_item_with_alerts(
+                food, [(level, days_until)] if level else []
+            )
 
             return {
                 'success': True,
@@ -117,28 +152,29 @@ class FoodExpiryTrackerApp:
             if not name_clean:
                 raise ValueError("Food name cannot be empty")
 
-            expiry = datetime.fromisoformat(expiry_date_str.strip())
-            if expiry < now_utc():
+            now = now_utc()
+            expiry = _fast_parse_iso(expiry_date_str.strip())
+            if expiry < now:
                 logger.warning(f"Added expired item: {name_clean} ({expiry_date_str})")
 
             food = FoodItem(
                 name=name_clean,
                 category=category.strip(),
-                purchase_date=now_utc(),
+                purchase_date=now,
                 expiry_date=expiry,
                 quantity=quantity,
-                unit=unit.strip(),
-                location=location.strip(),
+                unit=_maybe_intern(unit.strip()),
+                location=_maybe_intern(location.strip()),
                 status='active',
                 notes="Manually entered"
             )
 
-            item_id = self.db.add_food_item(food)
-            days_until = (expiry - now_utc()).days
+            days_until = (expiry - now).days
+            level = self.alerts.alert_level_for(days_until)
 
-            for threshold_name, threshold_days in self.alerts.ALERT_THRESHOLDS.items():
-                if days_until <= threshold_days:
-                    self.alerts.log_alert(item_id, threshold_name, days_until)
+            item_id = self.db.add_food_item_with_alerts(
+                food, [(level, days_until)] if level else []
+            )
 
             return {
                 'success': True,
@@ -159,42 +195,45 @@ class FoodExpiryTrackerApp:
         if days < 1:
             days = 7
 
-        expiring = self.alerts.get_expiring_items(days=days)
-        critical = self.alerts.get_critical_alerts()
-        summary = self.alerts.generate_alert_summary()
+        overview = self.alerts.get_expiry_overview(days=days)
 
         return {
-            'total_expiring': len(expiring),
-            'critical_count': len(critical),
-            'summary': summary,
-            'items': expiring
+            'total_expiring': len(overview['expiring']),
+            'critical_count': len(overview['critical']),
+            'summary': overview['summary'],
+            'items': overview['expiring']
         }
 
     def view_inventory(self, status: str = "active") -> dict:
-        """View current inventory"""
-        items = self.db.get_all_items(status=status)
-
-        formatted = []
-        now = now_utc()
-        for item in items:
-            days_left = (item.expiry_date - now).days if item.expiry_date else -999
-            formatted.append({
-                'id': item.id,
-                'name': item.name,
-                'category': item.category,
-                'quantity': f"{item.quantity:g} {item.unit}",
-                'expiry': item.expiry_date.strftime('%Y-%m-%d') if item.expiry_date else "N/A",
-                'days_left': days_left,
-                'location': item.location,
-                'status': item.status
-            })
-
-        return {'count': len(formatted), 'items': formatted}
+        """View current inventory ('items' is a generator of formatted rows)"""
+        count = self.db.count_items(status=status)
+
+        def iter_rows():
+            now_ms = now_utc().timestamp() * 1000.0
+            for items, expiry_ms in self.db.iter_item_batches(status=status):
+                days = np.floor((expiry_ms - now_ms) / 86_400_000.0)
+                days_left = np.where(np.isnan(days), -999, days).astype(np.int64).tolist()
+
+                for item, days in zip(items, days_left):
+                    yield {
+                        'id': item.id,
+                        'name': item.name,
+                        'category': item.category,
+                        'quantity': f"{item.quantity:g} {item.unit}",
+                        'expiry': item.expiry_date.isoformat()[:10] if item.expiry_date else "N/A",
+                        'days_left': days,
+                        'location': item.location,
+                        'status': item.status
+                    }
+
+        return {'count': count, 'items': iter_rows()}
 
     # ... (other methods remain mostly unchanged, just minor cleanups)
 
     def close(self):
         """Cleanup"""
+        self.alerts.close()
+        self.detector.close()
         self.db.close()
         logger.info("Application closed")
 
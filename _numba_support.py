@@ -0,0 +1,20 @@
+# Optional Numba JIT shared by the *_numba kernel modules
+
+import os
+from pathlib import Path
+
+from loguru import logger
+
+# Persist compiled kernels across CLI runs (must be set before numba is imported)
+os.environ.setdefault(
+    "NUMBA_CACHE_DIR", str(Path.home() / ".cache" / "food_tracker" / "numba")
+)
+
+# Kernel modules check HAS_NUMBA and keep a plain NumPy fallback
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    njit = None
+    HAS_NUMBA = False
+    logger.debug("numba not installed → kernels use their NumPy fallbacks")
@@ -1,23 +1,72 @@
 # Modern alert & notification system for expiring food items
 
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Tuple, Union
+import numpy as np
 from loguru import logger
 from dotenv import load_dotenv
 
-# Optional modern email service (recommended)
-try:
-    import resend
-    HAS_RESEND = True
-except ImportError:
-    HAS_RESEND = False
-    logger.warning("resend package not installed → falling back to SMTP (less secure)")
+UTC = timezone.utc
 
-load_dotenv()
-logger.add("logs/alerts.log", rotation="10 MB")
+# Optional modern email service (recommended) - imported on first use
+_resend = None
 
-UTC = timezone.utc
+
+def _get_resend():
+    """Import resend lazily; returns None when the package is not installed"""
+    global _resend
+    if _resend is None:
+        try:
+            import resend
+            _resend = resend
+        except ImportError:
+            _resend = False
+            logger.warning("resend package not installed → falling back to SMTP (less secure)")
+    return _resend or None
+
+
+# Email bodies - filled with str.format_map per send
+_SINGLE_ALERT_HTML = """
+<html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <h2>{emoji} Food Expiry Alert</h2>
+        <p><strong>{urgency}</strong></p>
+        <p>Your item <strong>"{item_name}"</strong> is expiring in
+           <strong>{days_remaining} day{plural}</strong>.</p>
+        <p>Quick actions:</p>
+        <ul>
+            <li>Use it today or tomorrow</li>
+            <li>Freeze for later</li>
+            <li>Share with neighbors/community</li>
+        </ul>
+        <hr style="border: 0; border-top: 1px solid #eee;">
+        <p style="font-size: 0.9em; color: #666;">
+            Sent by AI Food Expiry Tracker • Fighting food waste • SDG 12
+        </p>
+    </body>
+</html>
+"""
+
+_BATCH_SUMMARY_HTML = """
+<html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; background:#f8f9fa; padding:20px;">
+        <div style="max-width:600px; margin:auto; background:white; padding:25px; border-radius:8px;">
+            <h2>🍲 Daily Food Expiry Summary</h2>
+            <pre style="background:#f0f0f0; padding:15px; border-radius:6px; white-space:pre-wrap; font-family:monospace;">
+{summary_text}
+            </pre>
+            <p style="font-size:0.9em; color:#555; margin-top:20px;">
+                Keep tracking → reduce waste → better world 🌍<br>
+                <small>AI Food Expiry Tracker • {date}</small>
+            </p>
+        </div>
+    </body>
+</html>
+"""
 
 
 class AlertError(Exception):
@@ -34,18 +83,56 @@ class AlertSystem:
         'info': 7        # 7 days or less
     }
 
+    # (alert_level, emoji, heading) for each section of the text summary
+    _SUMMARY_SECTIONS = (
+        ('critical', '🔴', 'CRITICAL (Today or tomorrow)'),
+        ('warning', '🟠', 'WARNING (within 3 days)'),
+        ('info', 'ℹ️', 'INFO (within 7 days)'),
+    )
+
+    # Thresholds ordered most → least severe, for first-match lookups
+    THRESHOLDS_SORTED = tuple(sorted(ALERT_THRESHOLDS.items(), key=lambda kv: kv[1]))
+
+    _log_sink_added = False
+
     def __init__(self, database, email_config: Optional[Dict] = None):
+        if not AlertSystem._log_sink_added:
+            logger.add("logs/alerts.log", rotation="10 MB")
+            AlertSystem._log_sink_added = True
+
         self.db = database
         self.email_config = email_config or self._load_email_config()
         self.notifications_sent = 0
+        self._now_cache: Optional[datetime] = None
+        self._mail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="alert-mail")
+        self._smtp_conn = None
+        self._smtp_lock = threading.Lock()
+        self._sent_lock = threading.Lock()  # deliveries count in from mail threads
         self._validate_and_prepare_email()
         logger.info("AlertSystem initialized")
 
     def _now(self) -> datetime:
+        if self._now_cache is not None:
+            return self._now_cache
         return datetime.now(UTC)
 
+    @contextmanager
+    def _frozen_now(self) -> Iterator[datetime]:
+        """Pin _now() to a single timestamp for one logical operation"""
+        if self._now_cache is not None:
+            # Nested call - keep the outer operation's clock
+            yield self._now_cache
+            return
+
+        self._now_cache = datetime.now(UTC)
+        try:
+            yield self._now_cache
+        finally:
+            self._now_cache = None
+
     def _load_email_config(self) -> Dict[str, Any]:
         """Load config from environment variables"""
+        load_dotenv()
         config = {
             'provider': os.getenv('EMAIL_PROVIDER', 'smtp').lower(),
             'sender_email': os.getenv('EMAIL_SENDER'),
@@ -60,8 +147,11 @@ class AlertSystem:
     def _validate_and_prepare_email(self) -> None:
         """Validate config and decide sending method"""
         cfg = self.email_config
+        self._from_header = f"{cfg.get('sender_name')} <{cfg.get('sender_email')}>"
 
-        if cfg.get('provider') == 'resend' and HAS_RESEND and cfg.get('resend_api_key'):
+        resend = _get_resend() if cfg.get('provider') == 'resend' else None
+
+        if resend and cfg.get('resend_api_key'):
             resend.api_key = cfg['resend_api_key']
             logger.info("Email provider: Resend (recommended modern API)")
             cfg['sending_method'] = 'resend'
@@ -81,11 +171,28 @@ class AlertSystem:
             logger.info("Email provider: SMTP (legacy mode)")
             cfg['sending_method'] = 'smtp'
 
-    def check_expiry_status(self, expiry_date: datetime) -> Dict[str, Any]:
+    def check_expiry_status(self, expiry_date: datetime,
+                            now: Optional[datetime] = None) -> Dict[str, Any]:
         """Determine expiry status and alert level"""
-        now = self._now()
+        now = now or self._now()
         days_remaining = (expiry_date - now).days
 
+        if days_remaining < 0:
+            alert_level = 'critical'
+        elif days_remaining <= self.ALERT_THRESHOLDS['critical']:
+            alert_level = 'critical'
+        elif days_remaining <= self.ALERT_THRESHOLDS['warning']:
+            alert_level = 'warning'
+        elif days_remaining <= self.ALERT_THRESHOLDS['info']:
+            alert_level = 'info'
+        else:
+            alert_level = 'none'
+
+        return self._build_status(days_remaining, alert_level)
+
+    @staticmethod
+    def _build_status(days_remaining: int, alert_level: str) -> Dict[str, Any]:
+        """Build status info dict for an already-classified item"""
         if days_remaining < 0:
             return {
                 'status': 'expired',
@@ -93,7 +200,7 @@ class AlertSystem:
                 'alert_level': 'critical',
                 'message': '⚠️ Item has EXPIRED'
             }
-        elif days_remaining <= self.ALERT_THRESHOLDS['critical']:
+        elif alert_level == 'critical':
             return {
                 'status': 'expiring',
                 'days_remaining': days_remaining,
@@ -101,7 +208,7 @@ class AlertSystem:
                 'emoji': '🔴',
                 'message': f'URGENT - Expires in {days_remaining} day(s)'
             }
-        elif days_remaining <= self.ALERT_THRESHOLDS['warning']:
+        elif alert_level == 'warning':
             return {
                 'status': 'expiring',
                 'days_remaining': days_remaining,
@@ -109,7 +216,7 @@ class AlertSystem:
                 'emoji': '🟠',
                 'message': f'Warning - Expires in {days_remaining} days'
             }
-        elif days_remaining <= self.ALERT_THRESHOLDS['info']:
+        elif alert_level == 'info':
             return {
                 'status': 'expiring',
                 'days_remaining': days_remaining,
@@ -128,50 +235,88 @@ class AlertSystem:
 
     def get_expiring_items(self, days: int = 7) -> List[Dict[str, Any]]:
         """Get items expiring within N days with status info"""
-        items = self.db.get_expiring_items(days=days)
-        return [
-            {
-                'item': item,
-                'status_info': self.check_expiry_status(item.expiry_date),
-                'full_message': f"{item.name} - {self.check_expiry_status(item.expiry_date)['message']}"
+        rows = self.db.get_expiring_items_classified(
+            self.ALERT_THRESHOLDS, days=days, now=self._now()
+        )
+        return [self._make_entry(*row) for row in rows]
+
+    def _make_entry(self, item, days_remaining: int, alert_level: str) -> Dict[str, Any]:
+        status = self._build_status(days_remaining, alert_level)
+        return {
+            'item': item,
+            'status_info': status,
+            'full_message': f"{item.name} - {status['message']}"
+        }
+
+    def get_expiry_overview(self, days: int = 7) -> Dict[str, Any]:
+        """
+        Expiring items, critical items and the 7-day text summary,
+        all derived from a single classified query.
+
+        Returns:
+            Dict with 'expiring' and 'critical' entry lists and 'summary' text
+        """
+        with self._frozen_now() as now:
+            rows = self.db.get_expiring_items_classified(
+                self.ALERT_THRESHOLDS, days=max(days, 7), now=now
+            )
+            entries = [self._make_entry(*row) for row in rows]
+
+            def expires_by(entry: Dict[str, Any], cutoff: datetime) -> bool:
+                expiry = entry['item'].expiry_date
+                if expiry.tzinfo is None:
+                    expiry = expiry.replace(tzinfo=UTC)
+                return expiry <= cutoff
+
+            day_cutoff = now + timedelta(days=days)
+            week_cutoff = now + timedelta(days=7)
+
+            return {
+                'expiring': [e for e in entries if expires_by(e, day_cutoff)],
+                'critical': [e for e in entries
+                             if e['status_info']['alert_level'] == 'critical'],
+                'summary': self._render_summary([
+                    (e['item'].name, e['status_info']['days_remaining'],
+                     e['status_info']['alert_level'])
+                    for e in entries if expires_by(e, week_cutoff)
+                ])
             }
-            for item in items
-        ]
+
+    def _iter_classified(self, days: int = 7) -> Iterator[Tuple[str, int, str]]:
+        """Yield (name, days_remaining, alert_level) for items expiring within N days"""
+        rows = self.db.get_expiring_items_classified(
+            self.ALERT_THRESHOLDS, days=days, now=self._now()
+        )
+        for item, days_remaining, alert_level in rows:
+            yield item.name, days_remaining, alert_level
 
     def generate_alert_summary(self) -> str:
         """Generate readable text summary of current alerts"""
-        expiring = self.get_expiring_items(days=7)
+        with self._frozen_now():
+            return self._render_summary(list(self._iter_classified(days=7)))
 
+    def _render_summary(self, expiring: List[Tuple[str, int, str]]) -> str:
+        """Format (name, days_remaining, alert_level) rows as the text alert summary"""
         if not expiring:
             return "✓ No items expiring in the next 7 days. Your fridge looks good!"
 
         lines = [
-            f"🍲 FOOD EXPIRY ALERT - {self._now().strftime('%Y-%m-%d %H:%M')} UTC",
+            f"🍲 FOOD EXPIRY ALERT - {self._now().isoformat(sep=' ', timespec='minutes')[:16]} UTC",
             "=" * 60,
             ""
         ]
 
-        groups = {'critical': [], 'warning': [], 'info': []}
-
-        for entry in expiring:
-            level = entry['status_info']['alert_level']
+        groups: Dict[str, List[Tuple[str, int]]] = {'critical': [], 'warning': [], 'info': []}
+        for name, days, level in expiring:
             if level in groups:
-                groups[level].append(entry)
+                groups[level].append((name, days))
 
-        for level, items in [('critical', groups['critical']),
-                            ('warning', groups['warning']),
-                            ('info', groups['info'])]:
+        for level, emoji, title in self._SUMMARY_SECTIONS:
+            items = groups[level]
             if items:
-                emoji = {'critical': '🔴', 'warning': '🟠', 'info': 'ℹ️'}[level]
-                title = {
-                    'critical': 'CRITICAL (Today or tomorrow)',
-                    'warning': 'WARNING (within 3 days)',
-                    'info': 'INFO (within 7 days)'
-                }[level]
                 lines.append(f"{emoji} {title}:")
-                for entry in items:
-                    days = entry['status_info']['days_remaining']
-                    lines.append(f"  • {entry['item'].name} ({days} day{'s' if days != 1 else ''})")
+                for name, days in items:
+                    lines.append(f"  • {name} ({days} day{'s' if days != 1 else ''})")
                 lines.append("")
 
         lines.extend([
@@ -182,9 +327,71 @@ class AlertSystem:
 
         return "\n".join(lines)
 
+    def _get_smtp_connection(self):
+        """Return the persistent SMTP connection, opening and logging in if needed"""
+        import smtplib
+
+        if self._smtp_conn is None:
+            server = smtplib.SMTP(self.email_config['smtp_server'],
+                                  self.email_config['smtp_port'])
+            server.starttls()
+            server.login(self.email_config['sender_email'],
+                         self.email_config['smtp_password'])
+            self._smtp_conn = server
+            logger.debug("SMTP connection opened")
+        return self._smtp_conn
+
+    def _close_smtp_connection(self) -> None:
+        if self._smtp_conn is not None:
+            try:
+                self._smtp_conn.quit()
+            except Exception:
+                pass
+            finally:
+                self._smtp_conn = None
+
+    def _count_sent(self) -> None:
+        with self._sent_lock:
+            self.notifications_sent += 1
+
+    def _send_via_smtp(self, msg) -> None:
+        """Send a message over the shared SMTP connection, reconnecting once if dropped"""
+        import smtplib
+
+        with self._smtp_lock:
+            try:
+                self._get_smtp_connection().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                logger.debug("SMTP connection dropped - reconnecting")
+                self._smtp_conn = None
+                self._get_smtp_connection().send_message(msg)
+
+    def _deliver(self, recipient: str, subject: str, html: str) -> None:
+        """Send one HTML email with the configured provider (raises on failure)"""
+        if self.email_config['sending_method'] == 'resend':
+            _get_resend().Emails.send({
+                "from": self._from_header,
+                "to": recipient,
+                "subject": subject,
+                "html": html
+            })
+        else:
+            # Legacy SMTP (keep for compatibility, but not recommended)
+            from email.mime.text import MIMEText
+            from email.mime.multipart import MIMEMultipart
+
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = subject
+            msg['From'] = self.email_config['sender_email']
+            msg['To'] = recipient
+            msg.attach(MIMEText(html, 'html'))
+
+            self._send_via_smtp(msg)
+
     def send_single_email_alert(self, recipient: str, item_name: str, days_remaining: int,
-                               alert_level: str = 'warning') -> bool:
-        """Send email about single expiring item"""
+                               alert_level: str = 'warning',
+                               async_: bool = False) -> Union[bool, Future]:
+        """Send email about single expiring item (returns a Future if async_)"""
         if not self.email_config or not self.email_config.get('sending_method'):
             logger.warning("Email sending disabled - no valid config")
             return False
@@ -193,126 +400,71 @@ class AlertSystem:
         emoji = status.get('emoji', 'ℹ️')
         urgency = status['message']
 
-        html_content = f"""
-        <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <h2>{emoji} Food Expiry Alert</h2>
-                <p><strong>{urgency}</strong></p>
-                <p>Your item <strong>"{item_name}"</strong> is expiring in 
-                   <strong>{days_remaining} day{'s' if days_remaining != 1 else ''}</strong>.</p>
-                <p>Quick actions:</p>
-                <ul>
-                    <li>Use it today or tomorrow</li>
-                    <li>Freeze for later</li>
-                    <li>Share with neighbors/community</li>
-                </ul>
-                <hr style="border: 0; border-top: 1px solid #eee;">
-                <p style="font-size: 0.9em; color: #666;">
-                    Sent by AI Food Expiry Tracker • Fighting food waste • SDG 12
-                </p>
-            </body>
-        </html>
-        """
-
-        try:
-            if self.email_config['sending_method'] == 'resend':
-                resend.Emails.send({
-                    "from": f"{self.email_config['sender_name']} <{self.email_config['sender_email']}>",
-                    "to": recipient,
-                    "subject": f"🍲 Expiry Alert: {item_name}",
-                    "html": html_content
-                })
-            else:
-                # Legacy SMTP (keep for compatibility, but not recommended)
-                from email.mime.text import MIMEText
-                from email.mime.multipart import MIMEMultipart
-                import smtplib
-
-                msg = MIMEMultipart('alternative')
-                msg['Subject'] = f"🍲 Expiry Alert: {item_name}"
-                msg['From'] = self.email_config['sender_email']
-                msg['To'] = recipient
-                msg.attach(MIMEText(html_content, 'html'))
-
-                with smtplib.SMTP(self.email_config['smtp_server'],
-                                self.email_config['smtp_port']) as server:
-                    server.starttls()
-                    server.login(self.email_config['sender_email'],
-                               self.email_config['smtp_password'])
-                    server.send_message(msg)
-
-            logger.info(f"Alert sent to {recipient} about '{item_name}'")
-            self.notifications_sent += 1
-            return True
-
-        except Exception as e:
-            logger.error(f"Failed to send alert to {recipient}: {e}")
-            return False
-
-    def send_batch_alerts(self, recipient: str) -> Dict[str, Any]:
-        """Send summary email with all current alerts"""
+        html_content = _SINGLE_ALERT_HTML.format_map({
+            'emoji': emoji,
+            'urgency': urgency,
+            'item_name': item_name,
+            'days_remaining': days_remaining,
+            'plural': 's' if days_remaining != 1 else ''
+        })
+
+        subject = f"🍲 Expiry Alert: {item_name}"
+
+        def deliver() -> bool:
+            try:
+                self._deliver(recipient, subject, html_content)
+                logger.info("Alert sent to {} about '{}'", recipient, item_name)
+                self._count_sent()
+                return True
+            except Exception as e:
+                logger.error(f"Failed to send alert to {recipient}: {e}")
+                return False
+
+        if async_:
+            return self._mail_executor.submit(deliver)
+        return deliver()
+
+    def send_batch_alerts(self, recipient: str,
+                          async_: bool = False) -> Union[Dict[str, Any], Future]:
+        """Send summary email with all current alerts (returns a Future if async_)"""
         if not self.email_config or not self.email_config.get('sending_method'):
             return {'sent': False, 'count': 0, 'message': 'Email sending disabled - no valid config'}
 
         summary_text = self.generate_alert_summary()
 
-        html = f"""
-        <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; background:#f8f9fa; padding:20px;">
-                <div style="max-width:600px; margin:auto; background:white; padding:25px; border-radius:8px;">
-                    <h2>🍲 Daily Food Expiry Summary</h2>
-                    <pre style="background:#f0f0f0; padding:15px; border-radius:6px; white-space:pre-wrap; font-family:monospace;">
-{summary_text}
-                    </pre>
-                    <p style="font-size:0.9em; color:#555; margin-top:20px;">
-                        Keep tracking → reduce waste → better world 🌍<br>
-                        <small>AI Food Expiry Tracker • {self._now().strftime('%Y-%m-%d')}</small>
-                    </p>
-                </div>
-            </body>
-        </html>
-        """
+        html = _BATCH_SUMMARY_HTML.format_map({
+            'summary_text': summary_text,
+            'date': self._now().isoformat()[:10]
+        })
 
-        try:
-            if self.email_config['sending_method'] == 'resend':
-                resend.Emails.send({
-                    "from": f"{self.email_config['sender_name']} <{self.email_config['sender_email']}>",
-                    "to": recipient,
-                    "subject": "🍲 Daily Food Expiry Summary",
-                    "html": html
-                })
-            else:
-                # SMTP fallback
-                from email.mime.text import MIMEText
-                from email.mime.multipart import MIMEMultipart
-                import smtplib
-
-                msg = MIMEMultipart('alternative')
-                msg['Subject'] = "🍲 Daily Food Expiry Summary"
-                msg['From'] = self.email_config['sender_email']
-                msg['To'] = recipient
-                msg.attach(MIMEText(html, 'html'))
-
-                with smtplib.SMTP(self.email_config['smtp_server'],
-                                self.email_config['smtp_port']) as server:
-                    server.starttls()
-                    server.login(self.email_config['sender_email'],
-                               self.email_config['smtp_password'])
-                    server.send_message(msg)
-
-            count = len(self.get_expiring_items(days=7))
-            logger.info(f"Batch alert sent to {recipient} ({count} items)")
-            self.notifications_sent += 1
+        count = self.db.count_expiring_items(7, now=self._now())
 
-            return {
-                'sent': True,
-                'count': count,
-                'message': f"Summary sent ({count} items tracked)"
-            }
+        def deliver() -> Dict[str, Any]:
+            try:
+                self._deliver(recipient, "🍲 Daily Food Expiry Summary", html)
+                logger.info("Batch alert sent to {} ({} items)", recipient, count)
+                self._count_sent()
 
-        except Exception as e:
-            logger.error(f"Batch alert failed: {e}")
-            return {'sent': False, 'count': 0, 'message': str(e)}
+                return {
+                    'sent': True,
+                    'count': count,
+                    'message': f"Summary sent ({count} items tracked)"
+                }
+
+            except Exception as e:
+                logger.error(f"Batch alert failed: {e}")
+                return {'sent': False, 'count': 0, 'message': str(e)}
+
+        if async_:
+            return self._mail_executor.submit(deliver)
+        return deliver()
+
+    def alert_level_for(self, days_remaining: int) -> Optional[str]:
+        """Most severe threshold that applies to days_remaining (None if outside all)"""
+        return next(
+            (name for name, limit in self.THRESHOLDS_SORTED if days_remaining <= limit),
+            None
+        )
 
     def log_alert(self, food_item_id: int, alert_type: str, days_remaining: int) -> bool:
         """Record alert in database"""
@@ -324,27 +476,33 @@ class AlertSystem:
 
     def get_statistics(self) -> Dict[str, Any]:
         """Current alert system statistics"""
-        active_items = self.db.get_all_items('active')
-        expiring = self.get_expiring_items(7)
-        critical = [e for e in expiring if e['status_info']['alert_level'] == 'critical']
+        with self._frozen_now() as now:
+            total_active = self.db.count_items('active')
+            expiring_count = self.db.count_expiring_items(7, now=now)
 
-        avg_days = 0
-        valid_expiry_count = 0
-        for item in active_items:
-            if item.expiry_date:
-                days = (item.expiry_date - self._now()).days
-                avg_days += days
-                valid_expiry_count += 1
+            expiries = self.db.get_active_expiry_timestamps()
+            now64 = np.datetime64(now.replace(tzinfo=None), 'ms')
+            # Floor division matches timedelta.days for items already past expiry
+            days = (expiries - now64).astype(np.int64) // 86_400_000
+            avg_days = float(days.mean()) if days.size else 0
 
-        avg_days = avg_days / valid_expiry_count if valid_expiry_count > 0 else 0
+            critical = self.ALERT_THRESHOLDS['critical']
+            critical_count = int(np.count_nonzero((days >= 0) & (days <= critical)))
 
-        return {
-            'total_tracked_items': len(active_items),
-            'expiring_this_week': len(expiring),
-            'critical_items': len(critical),
-            'notifications_sent_total': self.notifications_sent,
-            'average_days_remaining': round(avg_days, 1)
-        }
+            return {
+                'total_tracked_items': total_active,
+                'expiring_this_week': expiring_count,
+                'critical_items': critical_count,
+                'notifications_sent_total': self.notifications_sent,
+                'average_days_remaining': round(avg_days, 1)
+            }
+
+    def close(self) -> None:
+        """Wait for queued emails and close the SMTP connection"""
+        self._mail_executor.shutdown(wait=True)
+        with self._smtp_lock:
+            self._close_smtp_connection()
+        logger.debug("AlertSystem closed")
 
 
 if __name__ == "__main__":
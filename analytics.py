@@ -1,15 +1,22 @@
 # Analytics and statistics for food waste tracking
 
+import copy
+import functools
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Any
-from collections import defaultdict
+from typing import Dict, List, Any, Optional
+import numpy as np
 from loguru import logger
 
-from database import FoodDatabase, FoodItem
+from database import FoodDatabase
 
 logger.add("logs/analytics.log", rotation="10 MB")
 
 UTC = timezone.utc
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+TRACKED_STATUSES = ('wasted', 'consumed', 'shared')
 
 
 class AnalyticsError(Exception):
@@ -17,6 +24,33 @@ class AnalyticsError(Exception):
     pass
 
 
+def _memoized(method):
+    """
+    Cache a FoodAnalytics method per (name, args) until the database changes
+    or CACHE_TTL_SECONDS pass (results also depend on the current time).
+    Callers get a copy, so mutating one result can't leak into the next.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        signature = self.db.data_signature()
+        now = time.monotonic()
+
+        hit = self._cache.get(key)
+        if hit and hit[0] == signature and now - hit[1] < self.CACHE_TTL_SECONDS:
+            self._cache.move_to_end(key)
+            return copy.deepcopy(hit[2])
+
+        value = method(self, *args, **kwargs)
+        self._cache[key] = (signature, now, value)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)  # least recently used
+        return copy.deepcopy(value)
+
+    return wrapper
+
+
 class FoodAnalytics:
     """Analytics engine for food waste and consumption patterns"""
 
@@ -44,13 +78,63 @@ class FoodAnalytics:
         'other': 1.0
     }
 
+    # Parallel lookup arrays indexed by category code; categories outside
+    # FOOD_COSTS are priced as 'other' (100 ₹, 1.0 kg CO₂e)
+    CAT_CODES = {cat: code for code, cat in enumerate(FOOD_COSTS)}
+    FOOD_COST_ARR = np.array(list(FOOD_COSTS.values()), dtype=np.float64)
+    CO2_ARR = np.array(list(map(CO2_EMISSIONS.get, FOOD_COSTS)), dtype=np.float64)
+
+    CACHE_TTL_SECONDS = 60
+    CACHE_MAX_ENTRIES = 16
+
     def __init__(self, database: FoodDatabase):
         self.db = database
+        self._cache: OrderedDict[tuple, tuple] = OrderedDict()
         logger.info("FoodAnalytics initialized")
 
     def _now(self) -> datetime:
         return datetime.now(UTC)
 
+    @classmethod
+    def _category_codes(cls, categories) -> np.ndarray:
+        """Category code per entry (unknown/blank → 'other')"""
+        other = cls.CAT_CODES['other']
+        return np.array([cls.CAT_CODES.get((c or 'other').lower(), other) for c in categories],
+                        dtype=np.intp)
+
+    @classmethod
+    def _item_costs(cls, categories: List[Optional[str]], quantities: List[float]) -> np.ndarray:
+        """FOOD_COSTS[category] * quantity per row, looking up each distinct category once"""
+        cats, idx = np.unique(np.array([c or '' for c in categories], dtype=object),
+                              return_inverse=True)
+        codes = cls._category_codes(cats)[idx]
+        return cls.FOOD_COST_ARR[codes] * np.asarray(quantities, dtype=np.float64)
+
+    def _columns(self, rows: List[tuple]) -> Dict[str, Any]:
+        """
+        Turn (..., status, category, count, qty_sum) aggregate rows into NumPy columns.
+        Categories are indexed in order of first appearance; cost/co2 are per-row weights.
+        """
+        cols = list(zip(*rows)) if rows else [()] * 4
+        cats, first, cat_idx = np.unique(np.array(cols[-3], dtype=object),
+                                         return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        cats, cat_idx = cats[order], np.argsort(order)[cat_idx].astype(np.intp)
+
+        qty = np.asarray(cols[-1], dtype=np.float64)
+        codes = self._category_codes(cats)[cat_idx]
+
+        return {
+            'keys': cols[:-4],
+            'status': np.array([TRACKED_STATUSES.index(st) for st in cols[-4]], dtype=np.intp),
+            'cats': cats,
+            'cat': cat_idx,
+            'count': np.asarray(cols[-2], dtype=np.int64),
+            'cost': self.FOOD_COST_ARR[codes] * qty,
+            'co2': self.CO2_ARR[codes] * qty
+        }
+
+    @_memoized
     def calculate_waste_statistics(self, days: int = 30) -> Dict[str, Any]:
         """
         Calculate key waste & consumption statistics for the given period.
@@ -63,90 +147,94 @@ class FoodAnalytics:
 
         cutoff = self._now() - timedelta(days=days)
 
-        # Fetch all relevant items (we'll filter in memory - acceptable for <10k items)
-        wasted_items = self.db.get_all_items('wasted')
-        consumed_items = self.db.get_all_items('consumed')
-        shared_items = self.db.get_all_items('shared')
-
-        def in_period(item: FoodItem) -> bool:
-            return item.updated_at is not None and item.updated_at >= cutoff
-
-        wasted = [item for item in wasted_items if in_period(item)]
-        consumed = [item for item in consumed_items if in_period(item)]
-        shared = [item for item in shared_items if in_period(item)]
+        c = self._columns(self.db.get_status_category_totals(TRACKED_STATUSES, since=cutoff))
+        counts, costs, co2 = (
+            np.bincount(c['status'], weights=c[col], minlength=3) for col in ('count', 'cost', 'co2')
+        )
 
-        total_tracked = len(wasted) + len(consumed) + len(shared)
-        waste_rate = (len(wasted) / total_tracked * 100) if total_tracked > 0 else 0.0
+        n_wasted, n_consumed, n_shared = (int(n) for n in counts)
+        waste_cost, shared_cost = float(costs[0]), float(costs[2])
+        waste_co2 = float(co2[0])
 
-        waste_cost = sum(self._get_item_cost(item) for item in wasted)
-        waste_co2 = sum(self._get_item_co2(item) for item in wasted)
-        shared_cost = sum(self._get_item_cost(item) for item in shared)
+        total_tracked = n_wasted + n_consumed + n_shared
+        waste_rate = (n_wasted / total_tracked * 100) if total_tracked > 0 else 0.0
 
         return {
             'period_days': days,
-            'items_wasted': len(wasted),
-            'items_consumed': len(consumed),
-            'items_shared': len(shared),
+            'items_wasted': n_wasted,
+            'items_consumed': n_consumed,
+            'items_shared': n_shared,
             'total_items': total_tracked,
             'waste_rate_percent': round(waste_rate, 2),
             'estimated_cost_wasted': round(waste_cost, 2),
             'co2_kg_wasted': round(waste_co2, 2),
-            'sharing_impact_items': len(shared),
+            'sharing_impact_items': n_shared,
             'sharing_impact_cost_saved': round(shared_cost, 2)
         }
 
+    @_memoized
+    def _monthly_totals(self) -> List[tuple]:
+        """All-time (month, status, category, count, qty) rows shared by the monthly and category views"""
+        return self.db.get_monthly_status_category_totals(TRACKED_STATUSES, include_undated=True)
+
     def get_monthly_breakdown(self) -> List[Dict[str, Any]]:
         """Monthly waste/consumption statistics (all-time)"""
-        months = defaultdict(lambda: {'wasted': 0, 'consumed': 0, 'shared': 0, 'cost_wasted': 0.0})
-
-        for status in ['wasted', 'consumed', 'shared']:
-            items = self.db.get_all_items(status=status)
-            for item in items:
-                if item.updated_at:
-                    month_key = item.updated_at.strftime('%Y-%m')
-                    months[month_key][status] += 1
-                    if status == 'wasted':
-                        months[month_key]['cost_wasted'] += self._get_item_cost(item)
+        rows = [r for r in self._monthly_totals() if r[0] is not None]
+        c = self._columns(rows)
+        month_keys, month_idx = np.unique(np.array(c['keys'][0] if rows else (), dtype=object),
+                                          return_inverse=True)
+
+        # (month, status) count grid as one bincount over the flattened cell index
+        # (buffered, unlike np.add.at), plus per-month wasted cost
+        n_months = len(month_keys)
+        counts = np.bincount(month_idx * 3 + c['status'], weights=c['count'],
+                             minlength=n_months * 3).astype(np.int64).reshape(n_months, 3)
+        wasted = c['status'] == 0
+        cost_wasted = np.bincount(month_idx[wasted], weights=c['cost'][wasted],
+                                  minlength=n_months)
 
         result = []
-        for month_key in sorted(months.keys()):
-            data = months[month_key]
-            total = data['wasted'] + data['consumed'] + data['shared']
-            waste_rate = (data['wasted'] / total * 100) if total > 0 else 0.0
+        for i, month_key in enumerate(month_keys):
+            n_wasted, n_consumed, n_shared = (int(n) for n in counts[i])
+            total = n_wasted + n_consumed + n_shared
+            waste_rate = (n_wasted / total * 100) if total > 0 else 0.0
 
             result.append({
                 'month': month_key,
-                'wasted': data['wasted'],
-                'consumed': data['consumed'],
-                'shared': data['shared'],
+                'wasted': n_wasted,
+                'consumed': n_consumed,
+                'shared': n_shared,
                 'total': total,
                 'waste_rate_percent': round(waste_rate, 2),
-                'cost_wasted_rupees': round(data['cost_wasted'], 2)
+                'cost_wasted_rupees': round(float(cost_wasted[i]), 2)
             })
 
         return result
 
+    @_memoized
     def get_category_analysis(self) -> Dict[str, Dict[str, Any]]:
         """Waste analysis grouped by category (all-time)"""
-        categories = defaultdict(lambda: {'total': 0, 'wasted': 0, 'cost': 0.0})
-
-        for status in ['wasted', 'consumed', 'shared']:
-            items = self.db.get_all_items(status=status)
-            for item in items:
-                cat = (item.category or 'other').lower()
-                categories[cat]['total'] += 1
-                if status == 'wasted':
-                    categories[cat]['wasted'] += 1
-                    categories[cat]['cost'] += self._get_item_cost(item)
+        # Same scan as the monthly breakdown, folded over months. Rows are sorted in
+        # TRACKED_STATUSES order, so categories are listed as the old per-status loop
+        # met them: wasted ones first, then consumed, then shared (by name within each)
+        rows = sorted(self._monthly_totals(), key=lambda r: (TRACKED_STATUSES.index(r[1]), r[2]))
+        c = self._columns(rows)
+        n_cats = len(c['cats'])
+        wasted = c['status'] == 0
+
+        totals = np.bincount(c['cat'], weights=c['count'], minlength=n_cats)
+        wasted_n = np.bincount(c['cat'][wasted], weights=c['count'][wasted], minlength=n_cats)
+        costs = np.bincount(c['cat'][wasted], weights=c['cost'][wasted], minlength=n_cats)
 
         result = {}
-        for cat, data in categories.items():
-            waste_rate = (data['wasted'] / data['total'] * 100) if data['total'] > 0 else 0.0
+        for i, cat in enumerate(c['cats']):
+            total, n_wasted = int(totals[i]), int(wasted_n[i])
+            waste_rate = (n_wasted / total * 100) if total > 0 else 0.0
             result[cat] = {
-                'total_items': data['total'],
-                'wasted_items': data['wasted'],
+                'total_items': total,
+                'wasted_items': n_wasted,
                 'waste_rate_percent': round(waste_rate, 2),
-                'estimated_cost_wasted': round(data['cost'], 2)
+                'estimated_cost_wasted': round(float(costs[i]), 2)
             }
 
         return result
@@ -166,43 +254,51 @@ class FoodAnalytics:
             'sdg_12_compliance': 'Good' if annual_stats['waste_rate_percent'] < 15 else 'Needs Improvement'
         }
 
+    @_memoized
     def predict_waste_items(self, days_ahead: int = 7) -> List[Dict[str, Any]]:
         """Predict items at high risk of waste in next N days"""
         now = self._now()
-        active = self.db.get_all_items('active')
+        # SQL window is in whole days from now; (expiry - now).days floors,
+        # so widen by one day and keep the original bounds below.
+        # Expiry comes back as epoch ms from SQLite, so nothing is parsed here
+        rows = self.db.get_all_items_lite(
+            'active', ('name', 'category', 'quantity', 'expiry_date'),
+            expiring_within=days_ahead + 1, now=now, epoch_ms=True
+        )
 
-        at_risk = [
-            item for item in active
-            if item.expiry_date and 0 < (item.expiry_date - now).days <= days_ahead
-        ]
+        now_ms = (now - EPOCH) // timedelta(milliseconds=1)
+        expiry_ms = np.array([r[3] for r in rows], dtype=np.int64)
+        # Rows come back in expiry order, so days is already non-decreasing
+        days = (expiry_ms - now_ms) // 86_400_000
+        keep = np.flatnonzero((days > 0) & (days <= days_ahead)).tolist()
 
-        sorted_risk = sorted(
-            at_risk,
-            key=lambda x: (x.expiry_date - now).days if x.expiry_date else 999
-        )
+        costs = self._item_costs([rows[i][1] for i in keep], [rows[i][2] for i in keep])
 
         result = []
-        for item in sorted_risk:
-            days_left = (item.expiry_date - now).days
+        for i, cost in zip(keep, costs.tolist()):
+            name, category = rows[i][0], rows[i][1]
+            days_left = int(days[i])
             risk_score = max(0, min(100, (1 - days_left / days_ahead) * 100))
 
             result.append({
-                'item_name': item.name,
-                'category': item.category,
+                'item_name': name,
+                'category': category,
                 'days_remaining': days_left,
                 'risk_score': round(risk_score, 1),
-                'estimated_cost': round(self._get_item_cost(item), 2),
+                'estimated_cost': round(cost, 2),
                 'recommendation': self._get_recommendation(days_left)
             })
 
         return result
 
-    def get_user_insights(self) -> List[str]:
+    def get_user_insights(self, stats_30d: Optional[Dict[str, Any]] = None) -> List[str]:
         """Generate human-readable, actionable insights"""
         insights = []
 
-        stats_30d = self.calculate_waste_statistics(30)
-        categories = self.get_category_analysis()
+        stats_30d = stats_30d or self.calculate_waste_statistics(30)
+        # Empty database: no categories or at-risk items to look up
+        has_items = stats_30d['total_items'] > 0 or self.db.has_items()
+        categories = self.get_category_analysis() if has_items else {}
 
         # Waste rate feedback
         rate = stats_30d['waste_rate_percent']
@@ -235,7 +331,7 @@ class FoodAnalytics:
             )
 
         # At-risk items warning
-        risky = self.predict_waste_items(days_ahead=3)
+        risky = self.predict_waste_items(days_ahead=3) if has_items else []
         if len(risky) > 4:
             insights.append(
                 f"📦 Urgent: {len(risky)} items are expiring in the next 3 days. "
@@ -246,9 +342,12 @@ class FoodAnalytics:
 
     def export_report(self, format: str = 'text') -> str:
         """Generate formatted report (text for now)"""
+        if not self.db.has_items():
+            return self._empty_report(format)
+
         stats = self.calculate_waste_statistics(30)
         impact = self.get_sustainability_impact()
-        insights = self.get_user_insights()
+        insights = self.get_user_insights(stats_30d=stats)
 
         if format.lower() == 'text':
             lines = [
@@ -294,15 +393,24 @@ class FoodAnalytics:
 
         return "Unsupported format"
 
-    @staticmethod
-    def _get_item_cost(item: FoodItem) -> float:
-        cat = (item.category or 'other').lower()
-        return FoodAnalytics.FOOD_COSTS.get(cat, 100) * item.quantity
+    def _empty_report(self, format: str) -> str:
+        """Short report for a database with nothing tracked yet"""
+        if format.lower() == 'text':
+            return "\n".join([
+                "=" * 70,
+                "FOOD WASTE & SUSTAINABILITY REPORT",
+                f"Generated: {self._now().strftime('%Y-%m-%d %H:%M:%S')} UTC",
+                "=" * 70,
+                "",
+                "No items tracked yet. Add some food items to see your report!",
+                "",
+                "=" * 70
+            ])
 
-    @staticmethod
-    def _get_item_co2(item: FoodItem) -> float:
-        cat = (item.category or 'other').lower()
-        return FoodAnalytics.CO2_EMISSIONS.get(cat, 1.0) * item.quantity
+        elif format.lower() == 'csv':
+            return "CSV export not yet implemented"
+
+        return "Unsupported format"
 
     @staticmethod
     def _get_recommendation(days_left: int) -> str:
@@ -8,9 +8,38 @@ st.set_page_config(page_title="AI Food Expiry Tracker", layout="wide")
 st.title("🍲 AI Food Expiry & Waste Tracker")
 st.markdown("Upload a photo of food label or add manually → never waste food again!")
 
-# Initialize
-db = FoodDatabase()
-detector = FoodExpiryDetector(tesseract_cmd=r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+
+# One database connection per browser session: a session's reruns are
+# serialized, but a process-wide connection would interleave transactions
+# across sessions
+def get_db() -> FoodDatabase:
+    if 'db' not in st.session_state:
+        st.session_state.db = FoodDatabase()
+    return st.session_state.db
+
+
+# Shared by every session (caches and OCR workers are thread-safe)
+@st.cache_resource
+def get_detector() -> FoodExpiryDetector:
+    return FoodExpiryDetector(tesseract_cmd=r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+
+
+def load_inventory(db: FoodDatabase) -> list:
+    """
+    Inventory rows for the dashboard, reused across this session's reruns until
+    the data changes. data_signature is only meaningful for the connection that
+    produced it, so the cache lives with the session, not the process.
+    """
+    signature = db.data_signature()
+    cached = st.session_state.get('inventory')
+    if cached is None or cached[0] != signature:
+        cached = (signature, [vars(i) for i in db.get_all_items(order='expiry_date ASC')])
+        st.session_state.inventory = cached
+    return cached[1]
+
+
+db = get_db()
+detector = get_detector()
 
 # Tabs for clean UI
 tab1, tab2, tab3 = st.tabs(["📸 Add from Photo", "✍️ Manual Entry", "📊 Dashboard"])
@@ -50,8 +79,8 @@ with tab2:
 
 with tab3:
     st.subheader("Current Inventory")
-    items = db.get_all_items()
+    items = load_inventory(db)
     if items:
-        st.dataframe([vars(i) for i in items])
+        st.dataframe(items)
     else:
         st.info("No items yet. Add some!")
\ No newline at end of file
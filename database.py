@@ -1,8 +1,10 @@
 # Database management for food inventory
 import sqlite3
+import sys
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Iterator, Optional, Tuple
+from dataclasses import dataclass, fields
+import numpy as np
 from loguru import logger
 
 logger.add("logs/database.log", rotation="10 MB")
@@ -49,7 +51,18 @@ class FoodDatabase:
         try:
             self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
             self.connection.row_factory = sqlite3.Row
-            logger.debug("Database connection established")
+
+            # WAL lets readers run alongside a writer; with synchronous=NORMAL
+            # commits no longer fsync (only checkpoints do)
+            journal_mode = self.connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("PRAGMA temp_store=MEMORY")
+            self.connection.execute("PRAGMA mmap_size=268435456")   # 256 MB
+            self.connection.execute("PRAGMA cache_size=-65536")     # 64 MB
+            # The CLI and Streamlit app may share the file: wait on a held
+            # write lock rather than failing with "database is locked"
+            self.connection.execute("PRAGMA busy_timeout=5000")
+            logger.debug("Database connection established (journal_mode={})", journal_mode)
         except sqlite3.Error as e:
             raise DatabaseError(f"Failed to connect to database {self.db_path}: {e}") from e
 
@@ -122,6 +135,37 @@ class FoodDatabase:
             )
         ''')
 
+        # Indexes
+        # Expiry lookups only ever scan active items
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_active_expiry
+            ON food_items(status, expiry_date) WHERE status = 'active'
+        ''')
+        # Covers the status/updated_at aggregates (no table lookups)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_items_status_updated_cover
+            ON food_items(status, updated_at, category, quantity)
+        ''')
+        # ON DELETE CASCADE looks up children by food_item_id
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_item
+            ON alerts(food_item_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sharing_item
+            ON food_sharing(food_item_id)
+        ''')
+
+        # One-time migration: older rows may hold mixed-case / blank categories
+        if cursor.execute("PRAGMA user_version").fetchone()[0] < 1:
+            cursor.execute('''
+                UPDATE food_items
+                SET category = COALESCE(NULLIF(LOWER(TRIM(category)), ''), 'other')
+                WHERE category IS NULL
+                   OR category != COALESCE(NULLIF(LOWER(TRIM(category)), ''), 'other')
+            ''')
+            cursor.execute("PRAGMA user_version = 1")
+
         self.connection.commit()
         logger.info("Database schema created/verified")
 
@@ -132,64 +176,261 @@ class FoodDatabase:
             raise ValueError("Food name cannot be empty")
         return cleaned  # You may also do .lower() if you want case-insensitive dedup
 
+    @staticmethod
+    def _normalize_category(category: Optional[str]) -> str:
+        """Stored form of a category: stripped, lower-case, blank → 'other' (interned)"""
+        return sys.intern((category or "").strip().lower() or "other")
+
+    _INSERT_FOOD_ITEM_SQL = '''
+        INSERT INTO food_items (
+            name, category, purchase_date, expiry_date, quantity, unit,
+            location, status, ocr_confidence, image_path, notes,
+            created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    def _food_item_params(self, food: FoodItem, now: str) -> tuple:
+        """Normalize the item in place and return its INSERT parameters"""
+        food.name = self._normalize_name(food.name)
+        food.category = self._normalize_category(food.category)
+        return (
+            food.name,
+            food.category,
+            food.purchase_date.isoformat() if food.purchase_date else None,
+            food.expiry_date.isoformat() if food.expiry_date else None,
+            food.quantity,
+            food.unit,
+            food.location,
+            food.status,
+            food.ocr_confidence,
+            food.image_path,
+            food.notes,
+            now,
+            now
+        )
+
+    def _insert_food_item(self, cursor: sqlite3.Cursor, food: FoodItem) -> int:
+        """INSERT one food item on the given cursor (no commit) - returns new ID"""
+        now = datetime.now(UTC).isoformat()
+        cursor.execute(self._INSERT_FOOD_ITEM_SQL, self._food_item_params(food, now))
+        return cursor.lastrowid
+
     def add_food_item(self, food: FoodItem) -> int:
         """Insert new food item - returns new ID"""
+        return self.add_food_item_with_alerts(food, [])
+
+    def add_food_items(self, items: List[FoodItem]) -> int:
+        """Insert many food items in one transaction - returns number inserted"""
         if not self.connection:
             raise DatabaseError("No active connection")
+        if not items:
+            return 0
 
         try:
-            cursor = self.connection.cursor()
-
-            food.name = self._normalize_name(food.name)
-
             now = datetime.now(UTC).isoformat()
+            with self.connection:
+                cursor = self.connection.executemany(
+                    self._INSERT_FOOD_ITEM_SQL,
+                    [self._food_item_params(food, now) for food in items]
+                )
+            logger.info("Food items added: {}", cursor.rowcount)
+            return cursor.rowcount
+        except (sqlite3.Error, ValueError) as e:
+            raise DatabaseError(f"Failed to add {len(items)} food items: {e}") from e
+
+    def add_food_item_with_alerts(self, food: FoodItem,
+                                  alerts: List[Tuple[str, int]]) -> int:
+        """
+        Insert a food item and its (alert_type, days_remaining) alerts
+        in a single transaction - returns new ID
+        """
+        if not self.connection:
+            raise DatabaseError("No active connection")
 
-            cursor.execute('''
-                INSERT INTO food_items (
-                    name, category, purchase_date, expiry_date, quantity, unit,
-                    location, status, ocr_confidence, image_path, notes,
-                    created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                food.name,
-                food.category,
-                food.purchase_date.isoformat() if food.purchase_date else None,
-                food.expiry_date.isoformat() if food.expiry_date else None,
-                food.quantity,
-                food.unit,
-                food.location,
-                food.status,
-                food.ocr_confidence,
-                food.image_path,
-                food.notes,
-                now,
-                now
-            ))
+        try:
+            cursor = self.connection.cursor()
+            item_id = self._insert_food_item(cursor, food)
+
+            if alerts:
+                triggered = datetime.now(UTC).isoformat()
+                cursor.executemany(
+                    '''
+                    INSERT INTO alerts (food_item_id, alert_type, triggered_date, days_remaining)
+                    VALUES (?, ?, ?, ?)
+                    ''',
+                    [(item_id, alert_type, triggered, days) for alert_type, days in alerts]
+                )
 
             self.connection.commit()
-            item_id = cursor.lastrowid
-            logger.info(f"Food item added: {food.name!r} (ID: {item_id})")
+            logger.info("Food item added: {!r} (ID: {})", food.name, item_id)
             return item_id
 
         except (sqlite3.Error, ValueError) as e:
             self.connection.rollback()
             raise DatabaseError(f"Failed to add food item '{food.name}': {e}") from e
 
-    def get_all_items(self, status: str = "active") -> List[FoodItem]:
-        """Get all items with given status, sorted by expiry"""
+    def get_all_items(self, status: str = "active", order: Optional[str] = None) -> List[FoodItem]:
+        """
+        Get all items with given status. Rows are unordered unless `order`
+        is given as '<column> ASC|DESC' (e.g. 'expiry_date ASC' for display).
+        """
+        query = "SELECT * FROM food_items WHERE status = ?"
+        if order:
+            column, _, direction = order.partition(" ")
+            if column not in {f.name for f in fields(FoodItem)} \
+                    or direction.upper() not in ("", "ASC", "DESC"):
+                raise ValueError(f"Invalid order: {order!r}")
+            query += f" ORDER BY {order}"
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(query, (status,))
+            return [self._row_to_fooditem(row) for row in cursor]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to get items (status={status}): {e}") from e
+
+    _DATE_COLUMNS = frozenset({'purchase_date', 'expiry_date', 'created_at', 'updated_at'})
+
+    def get_all_items_lite(
+        self,
+        status: str,
+        cols: Tuple[str, ...],
+        expiring_within: Optional[int] = None,
+        now: Optional[datetime] = None,
+        epoch_ms: bool = False
+    ) -> List[tuple]:
+        """
+        Raw column tuples for items with given status, sorted by expiry.
+        Values are returned as stored (dates stay ISO strings, nothing is parsed);
+        with epoch_ms, date columns come back as integer UTC epoch milliseconds
+        converted by SQLite instead.
+        With expiring_within, only rows in the get_expiring_items(N) window are returned.
+        """
+        unknown = set(cols) - {f.name for f in fields(FoodItem)}
+        if not cols or unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown) or cols}")
+
+        select = [
+            f"CAST(ROUND((julianday({c}) - 2440587.5) * 86400000) AS INTEGER)"
+            if epoch_ms and c in self._DATE_COLUMNS else c
+            for c in cols
+        ]
+        query = f"SELECT {', '.join(select)} FROM food_items WHERE status = ?"
+        params: list = [status]
+        if expiring_within is not None:
+            now = now or datetime.now(UTC)
+            query += " AND expiry_date <= ? AND expiry_date > ?"
+            params += [(now + timedelta(days=expiring_within)).isoformat(), now.isoformat()]
+        query += " ORDER BY expiry_date ASC"
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.row_factory = None
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to get items (status={status}): {e}") from e
+
+    def iter_item_batches(
+        self,
+        status: str = "active",
+        batch_size: int = 256
+    ) -> Iterator[Tuple[List[FoodItem], np.ndarray]]:
+        """
+        Yield items in expiry order, batch_size at a time, each batch paired with
+        a float64 array of expiry times in UTC epoch milliseconds (NaN if missing)
+        """
         try:
             cursor = self.connection.cursor()
             cursor.execute(
                 '''
-                SELECT * FROM food_items
+                SELECT *,
+                       (julianday(expiry_date) - 2440587.5) * 86400000.0 AS expiry_ms
+                FROM food_items
                 WHERE status = ?
                 ORDER BY expiry_date ASC
                 ''',
                 (status,)
             )
-            return [self._row_to_fooditem(row) for row in cursor.fetchall()]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                items = [self._row_to_fooditem(row) for row in rows]
+                expiry_ms = np.array([row['expiry_ms'] for row in rows], dtype=np.float64)
+                yield items, expiry_ms
         except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to get items (status={status}): {e}") from e
+            raise DatabaseError(f"Failed to iterate items (status={status}): {e}") from e
+
+    def get_status_category_totals(
+        self,
+        statuses: Tuple[str, ...],
+        since: Optional[datetime] = None
+    ) -> List[Tuple[str, str, int, float]]:
+        """
+        Item count and total quantity per (status, category), optionally limited
+        to items updated at or after `since`. Categories are lower-cased, with
+        empty/NULL folded into 'other'.
+
+        Returns:
+            List of (status, category, item_count, quantity_sum) tuples
+        """
+        placeholders = ", ".join("?" for _ in statuses)
+        query = f'''
+            SELECT status,
+                   LOWER(COALESCE(NULLIF(category, ''), 'other')) AS cat,
+                   COUNT(*),
+                   COALESCE(SUM(quantity), 0.0)
+            FROM food_items
+            WHERE status IN ({placeholders})
+        '''
+        params: list = list(statuses)
+        if since is not None:
+            query += " AND updated_at >= ?"
+            params.append(since.isoformat())
+        query += " GROUP BY status, cat"
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(query, params)
+            return [tuple(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to aggregate items by status/category: {e}") from e
+
+    def get_monthly_status_category_totals(
+        self,
+        statuses: Tuple[str, ...],
+        include_undated: bool = False
+    ) -> List[Tuple[Optional[str], str, str, int, float]]:
+        """
+        Item count and total quantity per (month of updated_at, status, category).
+        Month is the 'YYYY-MM' prefix of the stored timestamp; with include_undated,
+        items without updated_at are kept under month None.
+
+        Returns:
+            List of (month, status, category, item_count, quantity_sum) tuples
+        """
+        placeholders = ", ".join("?" for _ in statuses)
+        dated = "" if include_undated else "AND updated_at IS NOT NULL AND updated_at != ''"
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                f'''
+                SELECT NULLIF(substr(COALESCE(updated_at, ''), 1, 7), '') AS month,
+                       status,
+                       LOWER(COALESCE(NULLIF(category, ''), 'other')) AS cat,
+                       COUNT(*),
+                       COALESCE(SUM(quantity), 0.0)
+                FROM food_items
+                WHERE status IN ({placeholders})
+                  {dated}
+                GROUP BY month, status, cat
+                ''',
+                list(statuses)
+            )
+            return [tuple(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to aggregate items by month: {e}") from e
 
     def get_item_by_id(self, item_id: int) -> Optional[FoodItem]:
         """Fetch single item by ID"""
@@ -201,11 +442,11 @@ class FoodDatabase:
         except sqlite3.Error as e:
             raise DatabaseError(f"Failed to fetch item ID {item_id}: {e}") from e
 
-    def get_expiring_items(self, days: int = 7) -> List[FoodItem]:
+    def get_expiring_items(self, days: int = 7, now: Optional[datetime] = None) -> List[FoodItem]:
         """Items expiring in the next N days (active only)"""
         try:
             cursor = self.connection.cursor()
-            now = datetime.now(UTC)
+            now = now or datetime.now(UTC)
             cutoff = (now + timedelta(days=days)).isoformat()
             now_iso = now.isoformat()
 
@@ -219,10 +460,150 @@ class FoodDatabase:
                 ''',
                 (cutoff, now_iso)
             )
-            return [self._row_to_fooditem(row) for row in cursor.fetchall()]
+            return [self._row_to_fooditem(row) for row in cursor]
         except sqlite3.Error as e:
             raise DatabaseError(f"Failed to fetch expiring items ({days}d): {e}") from e
 
+    def get_expiring_items_classified(
+        self,
+        thresholds: Dict[str, int],
+        days: int = 7,
+        now: Optional[datetime] = None
+    ) -> List[Tuple[FoodItem, int, str]]:
+        """
+        Items expiring in the next N days, classified in SQL.
+
+        Returns:
+            List of (FoodItem, days_remaining, alert_level) tuples
+        """
+        try:
+            cursor = self.connection.cursor()
+            now = now or datetime.now(UTC)
+            cutoff = (now + timedelta(days=days)).isoformat()
+            now_iso = now.isoformat()
+
+            cursor.execute(
+                '''
+                SELECT *,
+                       CASE
+                           WHEN days_remaining <= :critical THEN 'critical'
+                           WHEN days_remaining <= :warning  THEN 'warning'
+                           WHEN days_remaining <= :info     THEN 'info'
+                           ELSE 'none'
+                       END AS alert_level
+                FROM (
+                    SELECT *,
+                           CAST(julianday(expiry_date) - julianday(:now) AS INTEGER) AS days_remaining
+                    FROM food_items
+                    WHERE status = 'active'
+                      AND expiry_date <= :cutoff
+                      AND expiry_date > :now
+                )
+                ORDER BY expiry_date ASC
+                ''',
+                {
+                    'critical': thresholds['critical'],
+                    'warning': thresholds['warning'],
+                    'info': thresholds['info'],
+                    'cutoff': cutoff,
+                    'now': now_iso
+                }
+            )
+            return [
+                (self._row_to_fooditem(row), row['days_remaining'], row['alert_level'])
+                for row in cursor
+            ]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to fetch classified expiring items ({days}d): {e}") from e
+
+    def count_items(self, status: str = "active") -> int:
+        """Number of items with given status"""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM food_items WHERE status = ?", (status,))
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to count items (status={status}): {e}") from e
+
+    def count_expiring_items(self, days: int = 7, now: Optional[datetime] = None) -> int:
+        """Number of active items in the get_expiring_items(N) window (ISO string bounds, no parsing)"""
+        try:
+            cursor = self.connection.cursor()
+            now = now or datetime.now(UTC)
+            cursor.execute(
+                '''
+                SELECT COUNT(*) FROM food_items
+                WHERE status = 'active'
+                  AND expiry_date <= ?
+                  AND expiry_date > ?
+                ''',
+                ((now + timedelta(days=days)).isoformat(), now.isoformat())
+            )
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to count expiring items ({days}d): {e}") from e
+
+    def has_items(self) -> bool:
+        """Whether any non-deleted item exists (stops at the first row)"""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT EXISTS(SELECT 1 FROM food_items WHERE status != 'deleted')")
+            return bool(cursor.fetchone()[0])
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to probe items: {e}") from e
+
+    def get_active_expiry_timestamps(self) -> np.ndarray:
+        """Expiry dates of all active items as a datetime64[ms] (UTC) array"""
+        try:
+            cursor = self.connection.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                '''
+                SELECT ms FROM (
+                    SELECT CAST(ROUND((julianday(expiry_date) - 2440587.5) * 86400000) AS INTEGER) AS ms
+                    FROM food_items
+                    WHERE status = 'active' AND expiry_date IS NOT NULL
+                )
+                WHERE ms IS NOT NULL
+                '''
+            )
+            # Stream straight into the array - no intermediate list of rows
+            return np.fromiter((row[0] for row in cursor), dtype=np.int64).astype('datetime64[ms]')
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to fetch active expiry timestamps: {e}") from e
+
+    def add_alert(self, food_item_id: int, alert_type: str, days_remaining: int) -> bool:
+        """Insert a single alert record"""
+        if not self.connection:
+            raise DatabaseError("No active connection")
+
+        try:
+            with self.connection:
+                self.connection.execute(
+                    '''
+                    INSERT INTO alerts (food_item_id, alert_type, triggered_date, days_remaining)
+                    VALUES (?, ?, ?, ?)
+                    ''',
+                    (food_item_id, alert_type, datetime.now(UTC).isoformat(), days_remaining)
+                )
+            return True
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to add alert for item {food_item_id}: {e}") from e
+
+    def data_signature(self) -> Tuple[int, int]:
+        """
+        Cheap token that changes whenever the database content changes -
+        rows written by this connection plus commits from other connections.
+        Only comparable with tokens from this same connection: the counters
+        are per connection, so two connections can report equal tokens for
+        different contents.
+        """
+        try:
+            data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+            return self.connection.total_changes, data_version
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to read data version: {e}") from e
+
     # ──────────────────────────────────────────────────────────────────────────────
     # Other methods (update, delete, status, alerts, sharing) follow similar pattern
     # ──────────────────────────────────────────────────────────────────────────────
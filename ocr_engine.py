@@ -3,8 +3,17 @@
 import cv2
 import pytesseract
 import numpy as np
+import os
 import re
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from hashlib import blake2b
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from loguru import logger
@@ -13,6 +22,30 @@ logger.add("logs/ocr_engine.log", rotation="10 MB")
 
 UTC = timezone.utc
 
+# Optional in-process Tesseract (libtesseract bindings) - falls back to
+# pytesseract, which runs the tesseract CLI once per pass
+try:
+    import tesserocr
+    from PIL import Image
+    HAS_TESSEROCR = True
+except ImportError:
+    HAS_TESSEROCR = False
+    logger.debug("tesserocr not installed → running Tesseract through pytesseract")
+
+# Optional faster regex engine for the date patterns - falls back to stdlib re
+try:
+    import regex as date_re
+    HAS_REGEX = True
+except ImportError:
+    date_re = re
+    HAS_REGEX = False
+
+# Possessive quantifiers: the regex module, or stdlib re from Python 3.11
+_POSSESSIVE_SUPPORTED = HAS_REGEX or sys.version_info >= (3, 11)
+# Runs that are always followed by something they can't match, so giving
+# up characters on backtrack can never help: month-name tails, whitespace, ", ." runs
+_BACKTRACK_FREE_RUNS = re.compile(r'(\[a-z\]\*|\\s\*|\[,\.\\s\]\*)')
+
 
 # ───────────────────────────────────────────────────────────────
 #          VERY IMPORTANT - Windows Fix
@@ -33,23 +66,76 @@ else:
     # You can continue without crashing, but OCR will fail
 
 
+def _possessive(pattern: str) -> str:
+    """Make the backtrack-free runs in a date pattern possessive, if the engine allows"""
+    if not _POSSESSIVE_SUPPORTED:
+        return pattern
+    return _BACKTRACK_FREE_RUNS.sub(r'\1+', pattern)
+
+
+def _image_key(image: np.ndarray) -> bytes:
+    """Fast content hash of an image array (shape and dtype included)"""
+    h = blake2b(digest_size=16)
+    h.update(f"{image.shape}{image.dtype}".encode())
+    h.update(np.ascontiguousarray(image).data)
+    return h.digest()
+
+
+class _BoundedCache:
+    """Small thread-safe LRU mapping for per-image results"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
 class ImagePreprocessor:
     """Image preprocessing pipeline optimized for expiry date OCR"""
 
+    _MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    # CLAHE.apply keeps scratch buffers on the object, so one instance per thread
+    _CLAHE = threading.local()
+
+    # Inputs sharp, contrasty and low-noise enough to skip the filter chain
+    CLEAN_MIN_LAPLACIAN_VAR = 500.0
+    CLEAN_MIN_STD = 40.0
+    CLEAN_MAX_NOISE_SIGMA = 3.0
+    # Immerkær's noise-estimation mask: cancels smooth content and straight edges
+    _NOISE_MASK = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
     @staticmethod
-    def load_image(image_path: str) -> np.ndarray:
+    def load_image(image_path: str, grayscale: bool = False) -> np.ndarray:
         path = Path(image_path)
         if not path.is_file():
             raise FileNotFoundError(f"Image not found: {image_path}")
 
-        img = cv2.imread(str(path))
+        # Grayscale decode skips the 3-channel buffer and the later cvtColor pass
+        flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+        img = cv2.imread(str(path), flags)
         if img is None:
             raise ValueError(f"Failed to load image: {image_path}")
-        logger.debug(f"Image loaded: {image_path} ({img.shape})")
+        logger.debug("Image loaded: {} ({})", image_path, img.shape)
         return img
 
     @staticmethod
     def convert_to_grayscale(image: np.ndarray) -> np.ndarray:
+        if image.ndim == 2:
+            return image
         return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
     @staticmethod
@@ -62,24 +148,114 @@ class ImagePreprocessor:
 
     @staticmethod
     def enhance_contrast(image: np.ndarray) -> np.ndarray:
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        local = ImagePreprocessor._CLAHE
+        clahe = getattr(local, 'clahe', None)
+        if clahe is None:
+            clahe = local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
         return clahe.apply(image)
 
+    @staticmethod
+    def looks_clean(gray: np.ndarray) -> bool:
+        """
+        True for sharp, high-contrast, low-noise grayscale input, where the
+        CLAHE / denoise / morphology chain adds nothing Tesseract's own
+        binarization doesn't already do.
+        """
+        h, w = gray.shape[:2]
+        if h < 3 or w < 3:
+            return False
+
+        _, std = cv2.meanStdDev(gray)
+        if std[0, 0] <= ImagePreprocessor.CLEAN_MIN_STD:
+            return False
+        if cv2.Laplacian(gray, cv2.CV_32F).var() <= ImagePreprocessor.CLEAN_MIN_LAPLACIAN_VAR:
+            return False
+
+        # Laplacian variance also rises with sensor noise, so rule that out separately
+        response = cv2.filter2D(gray.astype(np.float32), -1, ImagePreprocessor._NOISE_MASK)
+        sigma = np.sqrt(np.pi / 2) * np.abs(response[1:-1, 1:-1]).sum() / (6 * (w - 2) * (h - 2))
+        return sigma < ImagePreprocessor.CLEAN_MAX_NOISE_SIGMA
+
     @staticmethod
     def preprocess(image: np.ndarray) -> np.ndarray:
         gray = ImagePreprocessor.convert_to_grayscale(image)
         resized = ImagePreprocessor.resize_image(gray)
 
-        contrasted = ImagePreprocessor.enhance_contrast(resized)
-        denoised = cv2.fastNlMeansDenoising(contrasted, h=10)
+        if ImagePreprocessor.looks_clean(resized):
+            # Hand Tesseract the grayscale image; a plain Otsu mask only locates the text
+            _, mask = cv2.threshold(resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            cropped = ImagePreprocessor.crop_to_text(mask, image=resized)
+            logger.debug("Clean input, filter chain skipped ({} → {})", resized.shape, cropped.shape)
+            return cropped
+
+        # Filter chain runs through OpenCV's T-API: on a UMat each stage uses
+        # OpenCL when a device is available (plain CPU code otherwise).
+        # Upload after the resize so only the small grayscale image is copied
+        src = cv2.UMat(resized) if cv2.ocl.useOpenCL() else resized
+
+        contrasted = ImagePreprocessor.enhance_contrast(src)
+        # 3x3 median removes salt-and-pepper sensor noise; anything heavier is
+        # wasted on printed dates once Otsu binarizes
+        denoised = cv2.medianBlur(contrasted, 3)
         blurred = cv2.GaussianBlur(denoised, (3, 3), 0)
         _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        morphed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=1)
+        morphed = cv2.morphologyEx(
+            binary, cv2.MORPH_CLOSE, ImagePreprocessor._MORPH_KERNEL, iterations=1
+        )
+        if isinstance(morphed, cv2.UMat):
+            morphed = morphed.get()  # Tesseract / component analysis need host memory
+
+        cropped = ImagePreprocessor.crop_to_text(morphed)
+
+        logger.debug("OCR preprocessing completed ({} → {})", morphed.shape, cropped.shape)
+        return cropped
+
+    @staticmethod
+    def crop_to_text(binary: np.ndarray, pad: int = 12,
+                     image: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Crop a binarized image to the union box of connected components big
+        enough to be glyphs, so Tesseract reads fewer pixels. Returns the image
+        unchanged if nothing text-like is found or the crop would save little.
+
+        If image is given (same size as binary), that image is cropped instead.
+        """
+        if image is None:
+            image = binary
+        h, w = binary.shape[:2]
+        # Foreground (ink) is the minority class - dark text on light or the reverse
+        fg = cv2.bitwise_not(binary) if cv2.countNonZero(binary) > binary.size // 2 else binary
+
+        _, _, stats, _ = cv2.connectedComponentsWithStats(fg, connectivity=8)
+        comp_w, comp_h = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT]
+        # No upper size limit: on a close-up the glyphs themselves are the largest
+        # components, and a large border or shadow only widens the box (the
+        # 90% check below then leaves the image uncropped)
+        text_like = (comp_h >= 8) & (stats[1:, cv2.CC_STAT_AREA] >= 15)
+        boxes = stats[1:][text_like]
+        if not len(boxes):
+            return image
+
+        x0 = max(int(boxes[:, cv2.CC_STAT_LEFT].min()) - pad, 0)
+        y0 = max(int(boxes[:, cv2.CC_STAT_TOP].min()) - pad, 0)
+        x1 = min(int((boxes[:, cv2.CC_STAT_LEFT] + comp_w[text_like]).max()) + pad, w)
+        y1 = min(int((boxes[:, cv2.CC_STAT_TOP] + comp_h[text_like]).max()) + pad, h)
 
-        logger.debug("OCR preprocessing completed")
-        return morphed
+        if (x1 - x0) * (y1 - y0) > 0.9 * h * w:
+            return image
+        return image[y0:y1, x0:x1]
+
+
+@dataclass
+class DateCandidates:
+    """Date matches found in one OCR text, stored column-wise"""
+    dates: np.ndarray  # datetime64[D], UTC calendar days
+    confs: np.ndarray  # float64 base confidence per match
+    raws: List[str]    # matched text per match
+
+    def __len__(self) -> int:
+        return len(self.raws)
 
 
 class DateExtractor:
@@ -95,35 +271,59 @@ class DateExtractor:
         r'(?:EXP|Exp|Expiry|Best Before|Use By)\s*[:=]?\s*(\d{4}[-/.]\d{1,2}[-/.]\d{1,2})',
     ]
 
+    # Compiled once at class load instead of going through re's cache per call;
+    # OCR garbage can't make the possessive runs backtrack
+    _COMPILED_PATTERNS = tuple(date_re.compile(_possessive(p), date_re.IGNORECASE)
+                               for p in DATE_PATTERNS)
+
+    # All patterns fused into one alternation. It matches somewhere exactly when
+    # one of the patterns does, so text without a date is rejected in one scan
+    _ANY_DATE = date_re.compile(
+        "|".join(f"(?:{_possessive(p)})" for p in DATE_PATTERNS),
+        date_re.IGNORECASE
+    )
+
     MONTH_MAP = {
         'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
         'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
     }
+    # The month group captures exactly a 3-letter name; its usual spellings
+    # resolve in one dict hit, without lower()/slicing the match
+    _MONTH_LOOKUP = {variant: number for name, number in MONTH_MAP.items()
+                     for variant in (name, name.upper(), name.title())}
+
+    @classmethod
+    def _month_number(cls, name: str) -> Optional[int]:
+        return cls._MONTH_LOOKUP.get(name) or cls.MONTH_MAP.get(name.lower()[:3])
 
     @classmethod
     def parse_date(cls, text: str) -> Optional[datetime]:
-        for pattern in cls.DATE_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in cls._COMPILED_PATTERNS:
+            match = pattern.search(text)
             if not match:
                 continue
 
+            # The prefixed patterns capture the date as one group; the bare
+            # patterns find the same date in their match text
             groups = match.groups()
             if len(groups) != 3:
                 continue
 
             if not groups[1].isdigit():
-                month_str = groups[1].lower()[:3]
-                month = cls.MONTH_MAP.get(month_str)
-                if not month:
-                    continue
-                day, year = groups[0], groups[2]
+                day, month, year = int(groups[0]), cls._month_number(groups[1]), int(groups[2])
+            elif not groups[0].isdigit():
+                month, day, year = cls._month_number(groups[0]), int(groups[1]), int(groups[2])
+            elif len(groups[0]) == 4:
+                year, month, day = int(groups[0]), int(groups[1]), int(groups[2])
             else:
-                a, b, c = map(int, [g for g in groups if g.isdigit()])
+                a, b, c = int(groups[0]), int(groups[1]), int(groups[2])
                 if 1 <= a <= 31 and 1 <= b <= 12:
                     day, month, year = a, b, c
                 else:
                     day, month, year = b, a, c
 
+            if not month:
+                continue
             if year < 100:
                 year += 2000 if year < 50 else 1900
 
@@ -136,54 +336,81 @@ class DateExtractor:
 
         return None
 
+    # Base confidence of every regex match, before shelf-life weighting
+    MATCH_CONFIDENCE = 0.85
+
     @classmethod
-    def extract_potential_dates(cls, text: str) -> List[Dict[str, any]]:
-        candidates = []
-        for pattern in cls.DATE_PATTERNS:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
+    def extract_potential_dates(cls, text: str) -> DateCandidates:
+        dates, raws = [], []
+        # Per pattern, in order, each match re-parsed on its own text: overlapping
+        # hits (a bare date inside an EXP label) each stay a candidate
+        patterns = cls._COMPILED_PATTERNS if cls._ANY_DATE.search(text) else ()
+        for pattern in patterns:
+            for match in pattern.finditer(text):
                 raw = match.group(0)
                 dt = cls.parse_date(raw)
                 if dt:
-                    candidates.append({
-                        'date': dt,
-                        'raw': raw,
-                        'confidence': 0.85
-                    })
-        return candidates
+                    dates.append(dt.date())
+                    raws.append(raw)
+        return DateCandidates(
+            dates=np.array(dates, dtype='datetime64[D]'),
+            confs=np.full(len(raws), cls.MATCH_CONFIDENCE),
+            raws=raws
+        )
 
     @classmethod
-    def select_best_expiry(cls, candidates: List[Dict]) -> Optional[Dict]:
-        if not candidates:
+    def select_best_expiry(cls, candidates: DateCandidates,
+                           now: Optional[datetime] = None) -> Optional[Dict]:
+        if not len(candidates):
             return None
 
-        now = datetime.now(UTC)
-        scored = []
-
-        for cand in candidates:
-            days = (cand['date'] - now).days
-            conf = cand['confidence']
-
-            if 1 <= days <= 540:
-                conf *= 1.4
-            elif 1 <= days <= 1825:
-                conf *= 0.9
-            else:
-                conf *= 0.3
-
-            scored.append({**cand, 'confidence': min(conf, 1.0), 'days_until': days})
+        now = now or datetime.now(UTC)
+        # Whole days from now, floored like timedelta.days
+        now64 = np.datetime64(now.astimezone(UTC).replace(tzinfo=None), 'us')
+        days = (candidates.dates - now64) // np.timedelta64(1, 'D')
+        # Imported here so loading ocr_engine doesn't pay for Numba
+        from ocr_numba import score_candidates
+        scores = score_candidates(days, candidates.confs)
 
-        return max(scored, key=lambda x: x['confidence']) if scored else None
+        best = int(np.argmax(scores))  # first maximum, like max()
+        return {
+            'date': datetime.combine(candidates.dates[best].item(), datetime.min.time(), UTC),
+            'raw': candidates.raws[best],
+            'confidence': float(scores[best]),
+            'days_until': int(days[best])
+        }
 
 
 class FoodExpiryDetector:
     """Main OCR-based expiry date detector"""
 
+    # Repeat inputs (retries, re-shot labels) skip preprocessing / Tesseract
+    PREPROCESS_CACHE_SIZE = 16
+    TEXT_CACHE_SIZE = 128
+
+    # Page segmentation modes, text joined in this order. The first (6, a uniform
+    # block - label text) runs alone; the rest only if it isn't conclusive
+    PSM_MODES = (6, 7, 11, 3)
+    # Mean word confidence the first pass needs (with a date in its text) to stand alone
+    FAST_PATH_MIN_CONFIDENCE = 0.80
+
     def __init__(self, tesseract_cmd: Optional[str] = None, lang: str = 'eng'):
         if tesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
 
         self.lang = lang
         self.preprocessor = ImagePreprocessor()
+        self._preprocess_cache = _BoundedCache(self.PREPROCESS_CACHE_SIZE)
+        self._text_cache = _BoundedCache(self.TEXT_CACHE_SIZE)
+        # Fallback PSM passes run side by side (separate tesseract processes,
+        # or in-process APIs that release the GIL while recognizing)
+        self._ocr_executor = ThreadPoolExecutor(max_workers=len(self.PSM_MODES) - 1,
+                                                thread_name_prefix="ocr")
+        self._tess_apis = self._init_tess_apis() if HAS_TESSEROCR else None
+
+        if self._tess_apis:
+            logger.info("FoodExpiryDetector initialized (in-process libtesseract)")
+            return
 
         # Graceful version check (won't crash if path is wrong)
         try:
@@ -193,78 +420,313 @@ class FoodExpiryDetector:
             logger.warning(f"Could not get Tesseract version: {e}")
             logger.warning("Make sure Tesseract is installed and path is correct")
 
+    def _init_tess_apis(self) -> Optional[Dict[int, Tuple[object, threading.Lock]]]:
+        """
+        One libtesseract API per PSM, model loaded once. An API object is not
+        thread-safe, so each gets its own lock. None if the model can't be loaded.
+        """
+        apis = {}
+        try:
+            for psm in self.PSM_MODES:
+                api = tesserocr.PyTessBaseAPI(lang=self.lang, psm=psm, oem=tesserocr.OEM.DEFAULT)
+                apis[psm] = (api, threading.Lock())
+        except RuntimeError as e:
+            logger.warning(f"libtesseract unavailable ({e}) → using pytesseract")
+            for api, _ in apis.values():
+                api.End()
+            return None
+        return apis
+
+    def _preprocess(self, raw_img: np.ndarray) -> np.ndarray:
+        """
+        Preprocessed image, cached by raw image content: the binarized text crop,
+        or for input that looks_clean, the grayscale crop (no thresholding)
+        """
+        key = _image_key(raw_img)
+        processed = self._preprocess_cache.get(key)
+        if processed is None:
+            processed = self.preprocessor.preprocess(raw_img)
+            if processed is raw_img:  # clean small input passes through untouched
+                processed = processed.copy()
+            processed.setflags(write=False)
+            self._preprocess_cache.put(key, processed)
+        return processed
+
     def _extract_text(self, image: np.ndarray) -> Tuple[str, float]:
-        texts, confs = [], []
+        """OCR text and mean confidence over all PSM passes, cached by image content"""
+        key = (_image_key(image), self.lang)
+        cached = self._text_cache.get(key)
+        if cached is not None:
+            logger.debug("OCR cache hit")
+            return cached
+
+        result = self._run_ocr(image)
+        if result[0]:  # don't pin failures (e.g. Tesseract missing) in the cache
+            self._text_cache.put(key, result)
+        return result
 
-        for psm in [6, 7, 11, 3]:
-            try:
-                config = f'--psm {psm} --oem 3 -l {self.lang}'
-                text = pytesseract.image_to_string(image, config=config)
-
-                data = pytesseract.image_to_data(image, config=config,
-                                               output_type=pytesseract.Output.DICT)
-                valid_confs = [int(c) for c in data['conf'] if int(c) >= 0]
-                avg = np.mean(valid_confs) / 100.0 if valid_confs else 0.0
-
-                if text.strip():
-                    texts.append(text)
-                    confs.append(avg)
-            except Exception:
+    @staticmethod
+    def _data_to_text(data: Dict[str, list]) -> str:
+        """Rebuild image_to_string-style text (one line per Tesseract line) from image_to_data"""
+        lines, words, current = [], [], None
+        for block, par, line, word in zip(data['block_num'], data['par_num'],
+                                          data['line_num'], data['text']):
+            if not word.strip():
                 continue
+            if (block, par, line) != current:
+                if words:
+                    lines.append(" ".join(words))
+                words, current = [], (block, par, line)
+            words.append(word)
+        if words:
+            lines.append(" ".join(words))
+        return "\n".join(lines)
+
+    def _run_psm(self, image_path: str, psm: int) -> Optional[Tuple[str, float]]:
+        """One Tesseract pass → (text, mean word confidence), or None if empty / failed"""
+        try:
+            config = f'--psm {psm} --oem 3 -l {self.lang}'
+            # image_to_data already carries the words - no separate image_to_string run
+            data = pytesseract.image_to_data(image_path, config=config,
+                                             output_type=pytesseract.Output.DICT)
+            return self._pass_result(data)
+        except Exception:
+            return None
+
+    @classmethod
+    def _pass_result(cls, data: Dict[str, list]) -> Optional[Tuple[str, float]]:
+        """image_to_data-style columns → (text, mean word confidence), or None if empty"""
+        text = cls._data_to_text(data)
+        conf = np.fromiter(data['conf'], dtype=np.float64, count=len(data['conf']))
+        valid = conf[conf >= 0]  # -1 marks non-word rows
+        avg = float(valid.mean()) / 100.0 if valid.size else 0.0
+        return (text, avg) if text.strip() else None
+
+    def _run_psm_api(self, image: "Image.Image", psm: int) -> Optional[Tuple[str, float]]:
+        """One in-process Tesseract pass → (text, mean word confidence), or None if empty / failed"""
+        api, lock = self._tess_apis[psm]
+        try:
+            with lock:
+                api.SetImage(image)
+                text = api.GetUTF8Text()
+                confs = api.AllWordConfidences()
+            text = "\n".join(line for line in text.splitlines() if line.strip())
+            avg = float(np.mean(confs)) / 100.0 if confs else 0.0
+
+            if text:
+                return text, avg
+        except Exception:
+            pass
+        return None
+
+    def _run_ocr(self, image: np.ndarray) -> Tuple[str, float]:
+        if self._tess_apis:
+            # Every API reads the same in-memory image - no encode, no process spawn
+            return self._run_passes(self._run_psm_api, Image.fromarray(image))
 
-        if not texts:
+        # Encode the image once; every pass reads the same PNG instead of
+        # pytesseract re-encoding it per call
+        fd, image_path = tempfile.mkstemp(prefix="ocr_", suffix=".png")
+        os.close(fd)
+        try:
+            cv2.imwrite(image_path, image)
+            return self._run_passes(self._run_psm, image_path)
+        finally:
+            os.remove(image_path)
+
+    def _run_passes(self, run_pass, source) -> Tuple[str, float]:
+        """First PSM alone; the others side by side only if it isn't conclusive"""
+        first_psm, *other_psms = self.PSM_MODES
+        first = run_pass(source, first_psm)
+        if self._is_conclusive(first):
+            logger.debug("PSM {} conclusive, skipping the other passes", first_psm)
+            return first
+
+        futures = [self._ocr_executor.submit(run_pass, source, psm) for psm in other_psms]
+        return self._combine_passes([first] + [f.result() for f in futures])
+
+    def _is_conclusive(self, result: Optional[Tuple[str, float]]) -> bool:
+        """Confident pass whose text already contains a date"""
+        if not result or result[1] < self.FAST_PATH_MIN_CONFIDENCE:
+            return False
+        return len(DateExtractor.extract_potential_dates(result[0])) > 0
+
+    @staticmethod
+    def _combine_passes(results: List[Optional[Tuple[str, float]]]) -> Tuple[str, float]:
+        """Join the non-empty PSM passes in order; confidence is their mean"""
+        results = [r for r in results if r]
+        if not results:
             return "", 0.0
 
+        texts, confs = zip(*results)
         return " ".join(texts), float(np.mean(confs))
 
+    def _run_psm_batch(self, image_paths: List[str], list_path: str,
+                       psm: int) -> List[Optional[Tuple[str, float]]]:
+        """
+        One tesseract process over a file list → one pass result per image.
+        TSV output tags every row with its page (= list position), which
+        splits the combined output back per image.
+        """
+        cmd = [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout',
+               '--psm', str(psm), '--oem', '3', '-l', self.lang, 'tsv']
+        try:
+            out = subprocess.run(cmd, capture_output=True, check=True,
+                                 encoding='utf-8', errors='replace').stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"Batch tesseract run failed (psm {psm}): {e}")
+            return [None] * len(image_paths)
+
+        columns = ('block_num', 'par_num', 'line_num', 'conf', 'text')
+        pages = [{col: [] for col in columns} for _ in image_paths]
+        for row in out.splitlines()[1:]:  # skip the header
+            fields = row.split('\t', 11)
+            if len(fields) < 12 or not fields[1].isdigit():
+                continue
+            page = int(fields[1]) - 1
+            if not 0 <= page < len(pages):
+                continue
+            data = pages[page]
+            data['block_num'].append(fields[2])
+            data['par_num'].append(fields[3])
+            data['line_num'].append(fields[4])
+            data['conf'].append(float(fields[10]))
+            data['text'].append(fields[11])
+
+        return [self._pass_result(data) for data in pages]
+
+    def _run_ocr_batch(self, images: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """_run_ocr for many images, one tesseract process per PSM for the whole batch"""
+        with tempfile.TemporaryDirectory(prefix="ocr_batch_") as tmp_dir:
+            paths = []
+            for i, image in enumerate(images):
+                path = os.path.join(tmp_dir, f"{i}.png")
+                cv2.imwrite(path, image)
+                paths.append(path)
+
+            def run(psm: int, indices: List[int]) -> List[Optional[Tuple[str, float]]]:
+                list_path = os.path.join(tmp_dir, f"psm{psm}.txt")
+                with open(list_path, 'w', encoding='utf-8') as f:
+                    f.write("\n".join(paths[i] for i in indices) + "\n")
+                return self._run_psm_batch([paths[i] for i in indices], list_path, psm)
+
+            # Same policy as _run_passes: first PSM for all, the rest only where it's inconclusive
+            first_psm, *other_psms = self.PSM_MODES
+            first = run(first_psm, list(range(len(images))))
+            undecided = [i for i, r in enumerate(first) if not self._is_conclusive(r)]
+
+            results = list(first)
+            if undecided:
+                futures = [self._ocr_executor.submit(run, psm, undecided) for psm in other_psms]
+                others = [f.result() for f in futures]
+                for k, i in enumerate(undecided):
+                    results[i] = self._combine_passes([first[i]] + [o[k] for o in others])
+            return results
+
+    def close(self) -> None:
+        """Stop the OCR worker threads and release the in-process Tesseract APIs"""
+        self._ocr_executor.shutdown(wait=True)
+        if self._tess_apis:
+            for api, _ in self._tess_apis.values():
+                api.End()
+            self._tess_apis = None
+
     def extract_expiry_date(self, image_path: str) -> Dict[str, any]:
         try:
-            raw_img = self.preprocessor.load_image(image_path)
-            processed = self.preprocessor.preprocess(raw_img)
+            raw_img = self.preprocessor.load_image(image_path, grayscale=True)
+            processed = self._preprocess(raw_img)
 
             text, ocr_conf = self._extract_text(processed)
-            logger.debug(f"OCR confidence: {ocr_conf:.2%} | Text length: {len(text)}")
+            return self._expiry_from_text(text, ocr_conf)
+
+        except Exception as e:
+            logger.exception(f"Critical error during expiry detection: {image_path}")
+            return {
+                'success': False,
+                'error': str(e),
+                'ocr_confidence': 0.0
+            }
 
-            candidates = DateExtractor.extract_potential_dates(text)
+    def extract_expiry_dates_batch(self, image_paths: List[str]) -> List[Dict[str, any]]:
+        """
+        extract_expiry_date over many images, results in input order.
+        Images are loaded and preprocessed on the worker threads; with the
+        tesseract CLI, each PSM is a single run over every uncached image, so
+        the model loads once per PSM instead of once per image and pass.
+        """
+        if self._tess_apis:  # in-process: model already loaded, no per-image spawn
+            return [self.extract_expiry_date(path) for path in image_paths]
+
+        def prepare(image_path: str):
+            try:
+                return self._preprocess(self.preprocessor.load_image(image_path, grayscale=True))
+            except Exception as e:
+                logger.exception(f"Critical error during expiry detection: {image_path}")
+                return e
 
-            if not candidates:
-                return {
-                    'success': False,
-                    'error': 'No date pattern matched in text',
-                    'raw_text': text[:200] + "..." if len(text) > 200 else text,
-                    'ocr_confidence': ocr_conf
-                }
+        images = list(self._ocr_executor.map(prepare, image_paths))
 
-            best = DateExtractor.select_best_expiry(candidates)
+        texts, pending = {}, []
+        for i, image in enumerate(images):
+            if isinstance(image, Exception):
+                continue
+            key = (_image_key(image), self.lang)
+            cached = self._text_cache.get(key)
+            if cached is not None:
+                texts[i] = cached
+            else:
+                pending.append((i, key))
 
-            if not best:
-                return {
-                    'success': False,
-                    'error': 'Found dates but none valid as future expiry',
-                    'candidates': [c['raw'] for c in candidates],
-                    'ocr_confidence': ocr_conf
-                }
+        if pending:
+            ocr_results = self._run_ocr_batch([images[i] for i, _ in pending])
+            for (i, key), result in zip(pending, ocr_results):
+                texts[i] = result
+                if result[0]:
+                    self._text_cache.put(key, result)
 
-            days_left = (best['date'] - datetime.now(UTC)).days
+        now = datetime.now(UTC)
+        return [
+            {'success': False, 'error': str(image), 'ocr_confidence': 0.0}
+            if isinstance(image, Exception) else self._expiry_from_text(*texts[i], now=now)
+            for i, image in enumerate(images)
+        ]
 
+    @staticmethod
+    def _expiry_from_text(text: str, ocr_conf: float,
+                          now: Optional[datetime] = None) -> Dict[str, any]:
+        """Result dict of extract_expiry_date for one image's OCR text"""
+        logger.debug("OCR confidence: {:.2%} | Text length: {}", ocr_conf, len(text))
+
+        candidates = DateExtractor.extract_potential_dates(text)
+
+        if not candidates:
             return {
-                'success': True,
-                'date': best['date'].strftime('%Y-%m-%d'),
-                'raw_text': best['raw'],
-                'confidence': round(best['confidence'], 3),
-                'days_until_expiry': days_left,
-                'ocr_confidence': round(ocr_conf, 3),
-                'note': 'Extracted successfully'
+                'success': False,
+                'error': 'No date pattern matched in text',
+                'raw_text': text[:200] + "..." if len(text) > 200 else text,
+                'ocr_confidence': ocr_conf
             }
 
-        except Exception as e:
-            logger.exception(f"Critical error during expiry detection: {image_path}")
+        best = DateExtractor.select_best_expiry(candidates, now=now)
+
+        if not best:
             return {
                 'success': False,
-                'error': str(e),
-                'ocr_confidence': 0.0
+                'error': 'Found dates but none valid as future expiry',
+                'candidates': candidates.raws,
+                'ocr_confidence': ocr_conf
             }
 
+        return {
+            'success': True,
+            'date': best['date'].strftime('%Y-%m-%d'),
+            'raw_text': best['raw'],
+            'confidence': round(best['confidence'], 3),
+            'days_until_expiry': best['days_until'],
+            'ocr_confidence': round(ocr_conf, 3),
+            'note': 'Extracted successfully'
+        }
+
 
 # ───────────────────────────────────────────────────────────────
 #                     Quick Test / Demo
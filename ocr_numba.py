@@ -0,0 +1,54 @@
+# Expiry candidate scoring kernel (Numba-accelerated when available)
+
+import numpy as np
+
+from _numba_support import HAS_NUMBA, njit
+
+
+# Days-until-expiry windows: plausible shelf life, long shelf life, anything else
+LIKELY_MAX_DAYS = 540
+PLAUSIBLE_MAX_DAYS = 1825
+
+LIKELY_WEIGHT = 1.4
+PLAUSIBLE_WEIGHT = 0.9
+UNLIKELY_WEIGHT = 0.3
+
+
+if HAS_NUMBA:
+    # Explicit signature compiles at import; cache=True makes that a disk load
+    # after the first run
+    @njit('float64[:](int64[:], float64[:])', cache=True)
+    def _score_candidates_jit(days, conf):
+        out = np.empty(days.size, np.float64)
+        for i in range(days.size):
+            d = days[i]
+            if 1 <= d <= LIKELY_MAX_DAYS:
+                c = conf[i] * LIKELY_WEIGHT
+            elif 1 <= d <= PLAUSIBLE_MAX_DAYS:
+                c = conf[i] * PLAUSIBLE_WEIGHT
+            else:
+                c = conf[i] * UNLIKELY_WEIGHT
+            out[i] = min(c, 1.0)
+        return out
+
+
+def score_candidates(days: np.ndarray, conf: np.ndarray) -> np.ndarray:
+    """
+    Weight each candidate's base confidence by how plausible its
+    days-until-expiry is as a shelf life.
+
+    Returns:
+        float64 array of scores in [0, 1], one per candidate
+    """
+    days = np.ascontiguousarray(days, dtype=np.int64)
+    conf = np.ascontiguousarray(conf, dtype=np.float64)
+
+    if HAS_NUMBA:
+        return _score_candidates_jit(days, conf)
+
+    weight = np.select(
+        [(days >= 1) & (days <= LIKELY_MAX_DAYS), (days >= 1) & (days <= PLAUSIBLE_MAX_DAYS)],
+        [LIKELY_WEIGHT, PLAUSIBLE_WEIGHT],
+        default=UNLIKELY_WEIGHT
+    )
+    return np.minimum(conf * weight, 1.0)
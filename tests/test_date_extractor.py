@@ -0,0 +1,66 @@
+import unittest
+from datetime import date
+
+from ocr_engine import DateExtractor
+
+
+def _candidates(text):
+    found = DateExtractor.extract_potential_dates(text)
+    return [(d.item(), raw) for d, raw in zip(found.dates, found.raws)]
+
+
+class ExtractPotentialDatesTest(unittest.TestCase):
+
+    def test_text_without_date_has_no_candidates(self):
+        self.assertEqual(_candidates("milk 500g LOT 1234 12:30"), [])
+
+    def test_candidates_follow_pattern_order(self):
+        # The bare d/m/y pattern is tried before the EXP-prefixed one, so both
+        # hits on the labelled date are kept, bare first
+        self.assertEqual(
+            _candidates("MFG 01/02/2026 EXP 12.05.2027"),
+            [(date(2026, 2, 1), "01/02/2026"),
+             (date(2027, 5, 12), "12.05.2027"),
+             (date(2027, 5, 12), "12.05.2027"),
+             (date(2026, 2, 1), "MFG 01/02/2026"),
+             (date(2027, 5, 12), "EXP 12.05.2027")]
+        )
+
+    def test_day_and_month_swap_when_month_out_of_range(self):
+        self.assertEqual(_candidates("05/25/2027"), [(date(2027, 5, 25), "05/25/2027")])
+
+    def test_two_digit_year_and_range(self):
+        self.assertEqual(_candidates("12/05/27"), [(date(2027, 5, 12), "12/05/27")])
+        self.assertEqual(_candidates("12/05/2040"), [])
+
+    def test_year_first_dates(self):
+        self.assertEqual(_candidates("2027-05-12"), [(date(2027, 5, 12), "2027-05-12")])
+        self.assertEqual(
+            _candidates("EXP 2027/05/12"),
+            [(date(2027, 5, 12), "2027/05/12"), (date(2027, 5, 12), "EXP 2027/05/12")]
+        )
+        self.assertEqual(_candidates("2027-13-12"), [])
+
+    def test_day_month_name_year(self):
+        self.assertEqual(_candidates("12th May 2027"), [(date(2027, 5, 12), "12th May 2027")])
+        self.assertEqual(_candidates("3 SEPT 2026"), [(date(2026, 9, 3), "3 SEPT 2026")])
+        self.assertEqual(_candidates("31 Feb 2027"), [])
+
+    def test_month_name_day_year(self):
+        self.assertEqual(_candidates("May 12, 2027"), [(date(2027, 5, 12), "May 12, 2027")])
+        self.assertEqual(_candidates("dec. 1st 2026"), [(date(2026, 12, 1), "dec. 1st 2026")])
+
+    def test_month_name_dates_follow_numeric_candidates(self):
+        self.assertEqual(
+            _candidates("Jun 1 2026 best before 01/02/2027"),
+            [(date(2027, 2, 1), "01/02/2027"),
+             (date(2026, 6, 1), "Jun 1 2026"),
+             (date(2027, 2, 1), "best before 01/02/2027")]
+        )
+
+    def test_parse_date_reads_month_names(self):
+        parsed = DateExtractor.parse_date("Best before 12 Jan 2027")
+        self.assertEqual(parsed.date(), date(2027, 1, 12))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from ocr_engine import ImagePreprocessor
+
+
+def _label(shape, text, org, scale, thickness):
+    """White label with black text, binarized like preprocess output"""
+    img = np.full(shape, 255, np.uint8)
+    cv2.putText(img, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, 0, thickness)
+    return img
+
+
+class CropToTextTest(unittest.TestCase):
+
+    def test_large_glyph_close_up_keeps_every_glyph(self):
+        # Tight close-up of a date stamp: glyphs are taller than half the image
+        binary = _label((240, 900), "12/05", (40, 200), 6.0, 14)
+        glyph_ink = int(np.count_nonzero(binary == 0))
+        # Two glyph-sized scratches in a corner, away from the text
+        binary[10:22, 860:863] = 0
+        binary[14:26, 875:878] = 0
+
+        cropped = ImagePreprocessor.crop_to_text(binary)
+
+        self.assertGreaterEqual(int(np.count_nonzero(cropped == 0)), glyph_ink)
+
+    def test_small_label_in_large_frame_is_cropped(self):
+        binary = _label((675, 900), "EXP 12/05/2027", (300, 350), 1.0, 2)
+        ink = int(np.count_nonzero(binary == 0))
+
+        cropped = ImagePreprocessor.crop_to_text(binary)
+
+        self.assertLess(cropped.size, binary.size // 4)
+        self.assertEqual(int(np.count_nonzero(cropped == 0)), ink)
+
+    def test_grayscale_image_cropped_by_mask(self):
+        binary = _label((675, 900), "EXP 12/05/2027", (300, 350), 1.0, 2)
+        gray = np.where(binary == 0, 30, 220).astype(np.uint8)
+
+        cropped = ImagePreprocessor.crop_to_text(binary, image=gray)
+
+        self.assertEqual(cropped.shape, ImagePreprocessor.crop_to_text(binary).shape)
+        self.assertEqual(cropped.dtype, np.uint8)
+
+
+if __name__ == "__main__":
+    unittest.main()